@@ -1,7 +1,7 @@
 from typing import Optional
 import os
 from dotenv import load_dotenv
-from backend.storage import MemoryStorage, StorageBackend
+from backend.storage import AsyncMemoryStorage, AsyncStorageBackend, CachedStorage, LRUMemoryStorage, ThreadedStorage
 
 # Load environment variables
 load_dotenv()
@@ -12,7 +12,21 @@ DEFAULT_STORAGE_TYPE = os.getenv("STORAGE_TYPE", "memory")
 # Database configuration
 DB_PATH = os.getenv("DB_PATH", "sessions.db")
 
-def get_storage_backend() -> StorageBackend:
+# SQLite tuning: page cache per connection (KiB) and memory-mapped I/O size (bytes)
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "16384"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", "268435456"))
+
+# Memory storage caps: sessions held and estimated bytes held (0 for no limit)
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+MEMORY_MAX_BYTES = int(os.getenv("MEMORY_MAX_BYTES", "268435456"))
+
+# Sessions cached in memory in front of SQLite storage (0 disables the cache)
+STORAGE_CACHE_SESSIONS = int(os.getenv("STORAGE_CACHE_SESSIONS", "1000"))
+
+# Whether memory storage spills evicted sessions to the SQLite database at DB_PATH
+MEMORY_SPILL_TO_SQLITE = os.getenv("MEMORY_SPILL_TO_SQLITE", "false").lower() == "true"
+
+def get_storage_backend() -> AsyncStorageBackend:
     """Get the configured storage backend based on environment variables
     
     Returns:
@@ -22,8 +36,17 @@ def get_storage_backend() -> StorageBackend:
     
     if storage_type.lower() == "sqlite":
         # Import here to avoid circular imports
+        from backend.db_storage import AsyncSQLiteStorage
+        storage = AsyncSQLiteStorage(DB_PATH, cache_size_kb=SQLITE_CACHE_SIZE_KB, mmap_size=SQLITE_MMAP_SIZE)
+        if STORAGE_CACHE_SESSIONS > 0:
+            # Serve active sessions from memory, writing every change through to SQLite
+            return CachedStorage(storage, STORAGE_CACHE_SESSIONS)
+        return storage
+    elif MEMORY_SPILL_TO_SQLITE:
+        # Bounded memory storage that spills to SQLite; spills do disk I/O, so run it on I/O threads
         from backend.db_storage import SQLiteStorage
-        return SQLiteStorage(DB_PATH)
+        spill = SQLiteStorage(DB_PATH, cache_size_kb=SQLITE_CACHE_SIZE_KB, mmap_size=SQLITE_MMAP_SIZE)
+        return ThreadedStorage(LRUMemoryStorage(MEMORY_MAX_SESSIONS, MEMORY_MAX_BYTES, spill=spill))
     else:
-        # Default to memory storage
-        return MemoryStorage()
\ No newline at end of file
+        # Default to bounded memory storage
+        return AsyncMemoryStorage(LRUMemoryStorage(MEMORY_MAX_SESSIONS, MEMORY_MAX_BYTES))
\ No newline at end of file
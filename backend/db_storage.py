@@ -1,115 +1,302 @@
 import json
+import time
 import sqlite3
+import threading
 from typing import Dict, List, Any, Optional
-from backend.storage import StorageBackend
+from backend.storage import StorageBackend, ThreadedStorage
 
 class SQLiteStorage(StorageBackend):
-    """SQLite implementation of the storage backend"""
-    
-    def __init__(self, db_path: str = "sessions.db"):
+    """SQLite implementation of the storage backend
+
+    Uses one long-lived writer connection, serialized by a lock, plus one reader
+    connection per thread. The database runs in WAL mode so readers never block
+    the writer, and statements are reused through each connection's statement cache.
+    """
+
+    def __init__(self, db_path: str = "sessions.db", cache_size_kb: int = 16384, mmap_size: int = 268435456, busy_timeout_ms: int = 5000):
         """Initialize the SQLite storage backend
-        
+
         Args:
             db_path: Path to the SQLite database file
+            cache_size_kb: Page cache size per connection, in KiB
+            mmap_size: Maximum bytes of the database file to memory-map
+            busy_timeout_ms: How long to wait on a locked database before failing
         """
         self.db_path = db_path
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+
+        self._writer = self._connect()
         self._init_db()
-    
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open a connection with the tuned pragmas applied"""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=64
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode and avoids an fsync per commit
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        """Get the calling thread's reader connection, opening it on first use"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        """Run a read-only query on a reader connection"""
+        # An in-memory database is private to its connection, so reads must share the writer
+        if self.db_path == ":memory:":
+            with self._write_lock:
+                return self._writer.execute(sql, params).fetchall()
+        return self._reader().execute(sql, params).fetchall()
+
     def _init_db(self) -> None:
-        """Initialize the database schema"""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create sessions table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS sessions (
-            session_key TEXT PRIMARY KEY,
-            data TEXT NOT NULL,
-            last_activity REAL NOT NULL
+        """Initialize the database schema, migrating the legacy whole-session table if present"""
+        with self._write_lock, self._writer:
+            # Session metadata, updated in place
+            self._writer.execute("""
+            CREATE TABLE IF NOT EXISTS session_meta (
+                session_key TEXT PRIMARY KEY,
+                model TEXT,
+                last_activity REAL NOT NULL
+            )
+            """)
+
+            # One row per message, ordered by sequence number within a session
+            self._writer.execute("""
+            CREATE TABLE IF NOT EXISTS session_messages (
+                session_key TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (session_key, seq)
+            ) WITHOUT ROWID
+            """)
+
+            # Index for range scans over idle sessions during expiry
+            self._writer.execute(
+                "CREATE INDEX IF NOT EXISTS idx_session_meta_last_activity ON session_meta (last_activity)"
+            )
+
+            self._migrate_legacy_sessions()
+
+    def _migrate_legacy_sessions(self) -> None:
+        """Move sessions from the legacy JSON-blob table into the normalized tables
+
+        The legacy table is kept as sessions_legacy rather than dropped.
+        """
+        legacy = self._writer.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sessions'"
+        ).fetchone()
+        if not legacy:
+            return
+
+        for key, data in self._writer.execute("SELECT session_key, data FROM sessions").fetchall():
+            self._write_session(key, json.loads(data))
+
+        self._writer.execute("ALTER TABLE sessions RENAME TO sessions_legacy")
+
+    def _write_session(self, key: str, data: Dict[str, Any]) -> None:
+        """Replace a session's metadata and messages (caller holds the write lock and transaction)"""
+        self._writer.execute("""
+        INSERT INTO session_meta (session_key, model, last_activity)
+        VALUES (?, ?, ?)
+        ON CONFLICT(session_key) DO UPDATE SET model = excluded.model, last_activity = excluded.last_activity
+        """, (key, data.get("model"), data.get("last_activity", 0)))
+
+        self._writer.execute("DELETE FROM session_messages WHERE session_key = ?", (key,))
+        self._writer.executemany(
+            "INSERT INTO session_messages (session_key, seq, role, data) VALUES (?, ?, ?, ?)",
+            [(key, seq, msg["role"], json.dumps(msg)) for seq, msg in enumerate(data.get("messages", []), start=1)]
         )
-        """)
-        
-        conn.commit()
-        conn.close()
-    
+
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         """Get a session by key
-        
+
         Args:
             key: The session key
-            
+
         Returns:
             The session data or None if not found
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT data FROM sessions WHERE session_key = ?", (key,))
-        result = cursor.fetchone()
-        
-        conn.close()
-        
-        if result:
-            # Parse JSON data
-            return json.loads(result[0])
-        
-        return None
-    
+        meta = self._query("SELECT model, last_activity FROM session_meta WHERE session_key = ?", (key,))
+        if not meta:
+            return None
+
+        rows = self._query("SELECT data FROM session_messages WHERE session_key = ? ORDER BY seq", (key,))
+        model, last_activity = meta[0]
+        return {
+            "messages": [json.loads(data) for (data,) in rows],
+            "model": model,
+            "last_activity": last_activity
+        }
+
     def set(self, key: str, data: Dict[str, Any]) -> None:
         """Set or update a session
-        
+
         Args:
             key: The session key
             data: The session data
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Convert data to JSON
-        json_data = json.dumps(data)
-        
-        # Extract last_activity from data
-        last_activity = data.get("last_activity", 0)
-        
-        # Insert or replace session
-        cursor.execute("""
-        INSERT OR REPLACE INTO sessions (session_key, data, last_activity)
-        VALUES (?, ?, ?)
-        """, (key, json_data, last_activity))
-        
-        conn.commit()
-        conn.close()
-    
+        with self._write_lock, self._writer:
+            self._write_session(key, data)
+
+    def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        """Append messages to a session in one transaction and trim its history
+
+        The append is a batch of inserts, and trimming is a single ranged delete of
+        the oldest non-system messages, so the cost does not grow with history size.
+
+        Args:
+            key: The session key
+            messages: The messages to append, in order
+            max_messages: Maximum number of messages to keep in the session
+            last_activity: The new last activity timestamp
+        """
+        rows = [(msg["role"], json.dumps(msg)) for msg in messages]
+
+        with self._write_lock, self._writer:
+            self._writer.execute("""
+            INSERT INTO session_meta (session_key, model, last_activity)
+            VALUES (?, NULL, ?)
+            ON CONFLICT(session_key) DO UPDATE SET last_activity = excluded.last_activity
+            """, (key, last_activity))
+
+            (last_seq,) = self._writer.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM session_messages WHERE session_key = ?", (key,)
+            ).fetchone()
+            self._writer.executemany(
+                "INSERT INTO session_messages (session_key, seq, role, data) VALUES (?, ?, ?, ?)",
+                [(key, last_seq + i, role, data) for i, (role, data) in enumerate(rows, start=1)]
+            )
+
+            total, system = self._writer.execute("""
+            SELECT COUNT(*), COALESCE(SUM(role = 'system'), 0) FROM session_messages WHERE session_key = ?
+            """, (key,)).fetchone()
+
+            if total > max_messages:
+                # Delete every non-system message older than the most recent ones we keep
+                keep = max(max_messages - system, 0)
+                self._writer.execute("""
+                DELETE FROM session_messages
+                WHERE session_key = ? AND role != 'system' AND seq <= (
+                    SELECT seq FROM session_messages
+                    WHERE session_key = ? AND role != 'system'
+                    ORDER BY seq DESC LIMIT 1 OFFSET ?
+                )
+                """, (key, key, keep))
+
+    def update_session(self, key: str, **fields: Any) -> None:
+        """Update session metadata in place, creating the session if needed
+
+        Args:
+            key: The session key
+            **fields: Metadata fields to update (model, last_activity)
+        """
+        model = fields.get("model")
+        last_activity = fields.get("last_activity", time.time())
+
+        with self._write_lock, self._writer:
+            self._writer.execute("""
+            INSERT INTO session_meta (session_key, model, last_activity)
+            VALUES (?, ?, ?)
+            ON CONFLICT(session_key) DO UPDATE SET
+                model = CASE WHEN ? THEN excluded.model ELSE model END,
+                last_activity = CASE WHEN ? THEN excluded.last_activity ELSE last_activity END
+            """, (key, model, last_activity, "model" in fields, "last_activity" in fields))
+
     def delete(self, key: str) -> None:
         """Delete a session
-        
+
         Args:
             key: The session key
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM sessions WHERE session_key = ?", (key,))
-        
-        conn.commit()
-        conn.close()
-    
+        with self._write_lock, self._writer:
+            self._writer.execute("DELETE FROM session_messages WHERE session_key = ?", (key,))
+            self._writer.execute("DELETE FROM session_meta WHERE session_key = ?", (key,))
+
+    def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        """Delete sessions idle since before cutoff, oldest first
+
+        Uses the last_activity index, so the cost is proportional to the number
+        of sessions evicted rather than the size of the table.
+
+        Args:
+            cutoff: Sessions with last_activity before this timestamp are deleted
+            limit: Optional maximum number of sessions to delete in one call
+
+        Returns:
+            The number of sessions deleted
+        """
+        # The oldest idle sessions, found by a range scan on the last_activity index
+        expired = "SELECT session_key FROM session_meta WHERE last_activity < ? ORDER BY last_activity LIMIT ?"
+        params = (cutoff, -1 if limit is None else limit)
+
+        # Both deletes run in one transaction under the write lock, so they see the same sessions
+        with self._write_lock, self._writer:
+            self._writer.execute(f"DELETE FROM session_messages WHERE session_key IN ({expired})", params)
+            cursor = self._writer.execute(f"DELETE FROM session_meta WHERE session_key IN ({expired})", params)
+
+        return cursor.rowcount
+
     def get_all(self) -> Dict[str, Dict[str, Any]]:
         """Get all sessions
-        
+
         Returns:
             A dictionary of all sessions
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT session_key, data FROM sessions")
-        results = cursor.fetchall()
-        
-        conn.close()
-        
         sessions = {}
-        for key, data in results:
-            sessions[key] = json.loads(data)
-        
-        return sessions
\ No newline at end of file
+        for key, model, last_activity in self._query("SELECT session_key, model, last_activity FROM session_meta"):
+            sessions[key] = {"messages": [], "model": model, "last_activity": last_activity}
+
+        for key, data in self._query("SELECT session_key, data FROM session_messages ORDER BY session_key, seq"):
+            if key in sessions:
+                sessions[key]["messages"].append(json.loads(data))
+
+        return sessions
+
+    def close(self) -> None:
+        """Close all pooled connections"""
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        with self._write_lock:
+            self._writer.close()
+
+class AsyncSQLiteStorage(ThreadedStorage):
+    """Async SQLite storage that runs every query on dedicated I/O threads
+
+    Keeps disk access off the event loop. Each I/O thread gets its own reader
+    connection, and writes are serialized on the shared writer connection.
+    """
+
+    def __init__(self, db_path: str = "sessions.db", io_threads: int = 4, **kwargs: Any):
+        """Initialize the async SQLite storage backend
+
+        Args:
+            db_path: Path to the SQLite database file
+            io_threads: Number of dedicated I/O threads
+            **kwargs: Tuning options passed to SQLiteStorage
+        """
+        super().__init__(SQLiteStorage(db_path, **kwargs), max_workers=io_threads)
@@ -0,0 +1,81 @@
+import os
+import time
+import asyncio
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from backend.session import cleanup_sessions
+from utils.logger import get_logger
+
+# Load environment variables
+load_dotenv()
+
+# Set up logger
+logger = get_logger("session_expiry")
+
+# Seconds between expiry cycles
+SESSION_CLEANUP_INTERVAL = float(os.getenv("SESSION_CLEANUP_INTERVAL", "60"))
+
+# Maximum sessions evicted per cycle, which bounds the cost of one cycle
+SESSION_CLEANUP_BATCH = int(os.getenv("SESSION_CLEANUP_BATCH", "1000"))
+
+class SessionExpiry:
+    """Periodic task that evicts idle sessions in bounded batches"""
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: Optional[asyncio.Task] = None
+        self.cycles = 0
+        self.total_evicted = 0
+        self.last_evicted = 0
+        self.last_duration = 0.0
+
+    async def run_cycle(self) -> int:
+        """Run one expiry cycle
+
+        Returns:
+            The number of sessions evicted
+        """
+        start = time.perf_counter()
+        evicted = await cleanup_sessions(self.batch_size)
+        self.last_duration = time.perf_counter() - start
+        self.last_evicted = evicted
+        self.total_evicted += evicted
+        self.cycles += 1
+        if evicted:
+            logger.info(f"Evicted {evicted} idle sessions in {self.last_duration * 1000:.1f} ms")
+        return evicted
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                # A full batch means more sessions are waiting; keep going without sleeping
+                while await self.run_cycle() >= self.batch_size:
+                    await asyncio.sleep(0)
+            except Exception as e:
+                logger.error(f"Error expiring sessions: {str(e)}")
+
+    def start(self) -> None:
+        """Start the periodic task on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        """Stop the periodic task"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Get eviction metrics"""
+        return {
+            "cycles": self.cycles,
+            "total_evicted": self.total_evicted,
+            "last_evicted": self.last_evicted,
+            "last_duration_ms": round(self.last_duration * 1000, 3)
+        }
+
+# Global expiry task for the backend
+session_expiry = SessionExpiry(SESSION_CLEANUP_INTERVAL, SESSION_CLEANUP_BATCH)
@@ -1,16 +1,16 @@
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from backend.routes import router
-from backend.config import get_storage_backend
-from backend.session import set_storage_backend
+from backend.service import init_services, start_background_tasks, shutdown_services
+from backend.storage import count_storage_ops
 
 # Load environment variables
 load_dotenv()
 
-# Initialize session manager with configured storage backend
-set_storage_backend(get_storage_backend())
+# Initialize session storage and provider clients
+init_services()
 
 # Create FastAPI app
 app = FastAPI(title="Discord LLM Bot Backend")
@@ -24,9 +24,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Streaming endpoints load and flush the session while the body is sent, after the
+# headers have gone out, so their storage operations cannot be reported in a header
+STREAMING_PATHS = {"/chat/stream"}
+
+@app.middleware("http")
+async def storage_ops_header(request: Request, call_next):
+    # Report how many storage operations the request made, to keep the hot path lean
+    if request.url.path in STREAMING_PATHS:
+        return await call_next(request)
+    with count_storage_ops() as counts:
+        response = await call_next(request)
+        response.headers["X-Storage-Ops"] = str(sum(counts.values()))
+    return response
+
 # Include API routes
 app.include_router(router)
 
+@app.on_event("startup")
+async def startup():
+    # Start periodic session expiry
+    start_background_tasks()
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Release pooled provider connections
+    await shutdown_services()
+
 @app.get("/")
 async def root():
     return {"message": "Discord LLM Bot API is running"}
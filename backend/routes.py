@@ -1,9 +1,10 @@
+import asyncio
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
-from backend.session import get_memory, add_to_memory
-from models.router import get_llm_response, set_user_model
-from utils.file_parser import parse_file
+from backend import service
+from utils.parse_pool import ParserBusyError
 
 # Pydantic models for request validation
 class ChatRequest(BaseModel):
@@ -22,58 +23,36 @@ router = APIRouter()
 async def chat(request: ChatRequest) -> Dict[str, Any]:
     """Process a chat message and get a response from the LLM"""
     try:
-        # Get user's chat history with context if provided
-        memory = get_memory(request.user_id, request.context_id)
-        
-        # Add user message to memory
-        add_to_memory(request.user_id, {"role": "user", "content": request.message}, request.context_id)
-        
-        # Get response from the appropriate LLM
-        response = await get_llm_response(request.user_id, request.message, memory, request.context_id)
-        
-        # Add assistant response to memory
-        add_to_memory(request.user_id, {"role": "assistant", "content": response}, request.context_id)
-        
+        response = await service.chat(request.user_id, request.message, request.context_id)
         return {"response": response}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest) -> StreamingResponse:
+    """Process a chat message and stream the LLM response as chunked plain text"""
+    try:
+        token_stream = await service.chat_stream(request.user_id, request.message, request.context_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+    return StreamingResponse(token_stream, media_type="text/plain; charset=utf-8")
+
 @router.post("/upload")
-async def upload(user_id: str = Form(...), file: UploadFile = File(...), question: str = Form(None), context_id: Optional[str] = Form(None)) -> Dict[str, Any]:
-    """Process an uploaded file and optionally answer a question about it"""
+async def upload(user_id: str = Form(...), file: Optional[UploadFile] = File(None), files: Optional[List[UploadFile]] = File(None), question: str = Form(None), context_id: Optional[str] = Form(None), pages: Optional[str] = Form(None)) -> Dict[str, Any]:
+    """Process one or more uploaded files and optionally answer a question about them
+
+    Accepts a single file in the "file" field, several in repeated "files" fields, or both.
+    """
+    uploads = ([file] if file is not None else []) + (files or [])
     try:
-        # Parse the uploaded file
-        parsed_content = await parse_file(file)
-        
-        # Add file content to user's memory as system message
-        if parsed_content["type"] == "image":
-            # For images, store the full image data including base64
-            system_message = parsed_content
-            response_message = f"Image '{file.filename}' uploaded and processed successfully. The AI can now see and analyze this image."
-        else:
-            # For text-based files (PDF, DOCX)
-            system_message = f"Content from uploaded file '{file.filename}':\n{parsed_content['content']}"
-            response_message = f"File '{file.filename}' uploaded and processed successfully."
-        
-        add_to_memory(user_id, {"role": "system", "content": system_message}, context_id)
-        
-        # If a question was provided, process it immediately
-        if question:
-            # Add user question to memory
-            add_to_memory(user_id, {"role": "user", "content": question}, context_id)
-            
-            # Get memory for context
-            memory = get_memory(user_id, context_id)
-            
-            # Get response from the LLM
-            response = await get_llm_response(user_id, question, memory, context_id)
-            
-            # Add assistant response to memory
-            add_to_memory(user_id, {"role": "assistant", "content": response}, context_id)
-            
-            return {"response": response}
-        
-        return {"response": response_message}
+        contents = await asyncio.gather(*(upload.read() for upload in uploads))
+        response = await service.upload_files(user_id, [(upload.filename, content) for upload, content in zip(uploads, contents)], question, context_id, pages)
+        return {"response": response}
+    except ParserBusyError as be:
+        raise HTTPException(status_code=503, detail=str(be))
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
@@ -81,19 +60,14 @@ async def upload(user_id: str = Form(...), file: UploadFile = File(...), questio
 async def set_model_route(request: ModelRequest) -> Dict[str, Any]:
     """Set the LLM model for a specific user"""
     try:
-        # Validate model choice
-        valid_models = ["gemini-2.0-flash", "gemini-2.5-pro-experimental", "deepseek-v3"]
-        if request.model not in valid_models:
-            raise HTTPException(
-                status_code=400, 
-                detail=f"Invalid model. Choose from: {', '.join(valid_models)}"
-            )
-        
-        # Set the user's model preference
-        set_user_model(request.user_id, request.model, request.context_id)
-        
-        return {"response": f"Model set to {request.model}"}
-    except HTTPException as he:
-        raise he
+        response = await service.set_model(request.user_id, request.model, request.context_id)
+        return {"response": response}
+    except ValueError as ve:
+        raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error setting model: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error setting model: {str(e)}")
+
+@router.get("/metrics")
+async def metrics() -> Dict[str, Any]:
+    """Report runtime metrics for sizing the backend under load"""
+    return service.get_metrics()
\ No newline at end of file
@@ -0,0 +1,274 @@
+import os
+import asyncio
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from backend.config import get_storage_backend
+from backend.summarizer import maybe_schedule_summary, cancel_summaries
+from backend.expiry import session_expiry
+from backend.session import load_session, session_scope, set_storage_backend, close_storage_backend, get_storage_metrics, get_storage_stats
+from models.deepseek import close_deepseek_session
+from models.response_cache import response_cache
+from models.router import get_llm_response, stream_llm_response, set_user_model, resolve_model, init_model_clients
+from utils.file_parser import parse_content
+from utils.retrieval import document_index
+from utils.parse_cache import parse_cache
+from utils.parse_pool import parse_pool
+from utils.image_pipeline import image_part_cache
+from utils.thread_pool import provider_pool
+
+# Load environment variables
+load_dotenv()
+
+# Whether requests for one conversation are processed one at a time, in arrival order,
+# so each LLM call sees the previous turn's reply
+SERIALIZE_SESSION_REQUESTS = os.getenv("SERIALIZE_SESSION_REQUESTS", "false").lower() == "true"
+
+# Maximum number of files accepted in one upload
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "10"))
+
+# Maximum files of one upload parsed at the same time
+UPLOAD_PARSE_CONCURRENCY = int(os.getenv("UPLOAD_PARSE_CONCURRENCY", "4"))
+
+# Models that can be selected with set_model
+SELECTABLE_MODELS = ["gemini-2.0-flash", "gemini-2.5-pro-experimental", "deepseek-v3"]
+
+# Whether the shared backend state has been initialized in this process
+_initialized = False
+
+def init_services() -> None:
+    """Initialize the storage backend and provider clients once per process
+
+    Called both by the FastAPI startup hook and by the bot's in-process transport,
+    so it is safe to call more than once.
+    """
+    global _initialized
+    if _initialized:
+        return
+    _initialized = True
+
+    # Initialize session manager with configured storage backend
+    set_storage_backend(get_storage_backend())
+
+    # Build long-lived provider clients once, before the first request
+    init_model_clients()
+
+def start_background_tasks() -> None:
+    """Start the periodic backend jobs on the running event loop"""
+    session_expiry.start()
+
+async def shutdown_services() -> None:
+    """Release pooled provider connections, worker threads and storage connections"""
+    await session_expiry.stop()
+    await cancel_summaries()
+    await close_deepseek_session()
+    provider_pool.shutdown()
+    parse_pool.shutdown()
+    response_cache.close()
+    await close_storage_backend()
+
+async def chat(user_id: str, message: str, context_id: Optional[str] = None) -> str:
+    """Process a chat message and get a response from the LLM
+
+    Args:
+        user_id: The Discord user ID
+        message: The user's message
+        context_id: Optional context ID (thread_id or dm_channel_id)
+
+    Returns:
+        The LLM response text
+    """
+    # Load the session once; it is flushed in a single write when the block exits
+    async with session_scope(user_id, context_id, exclusive=SERIALIZE_SESSION_REQUESTS) as session:
+        # Add user message to memory
+        session.add_message({"role": "user", "content": message})
+
+        # Get response from the appropriate LLM
+        model = resolve_model(user_id, context_id, session.model)
+        response = await get_llm_response(user_id, message, session.messages, context_id, model=model)
+
+        # Add assistant response to memory
+        session.add_message({"role": "assistant", "content": response})
+
+    # Compress older turns in the background once the conversation grows long
+    maybe_schedule_summary(user_id, session.messages, context_id)
+
+    return response
+
+async def chat_stream(user_id: str, message: str, context_id: Optional[str] = None) -> AsyncIterator[str]:
+    """Process a chat message and yield the LLM response tokens as they arrive
+
+    Args:
+        user_id: The Discord user ID
+        message: The user's message
+        context_id: Optional context ID (thread_id or dm_channel_id)
+
+    Returns:
+        An async iterator of response tokens
+    """
+    async def token_stream():
+        # Load the session once, when streaming starts; it is flushed when the stream finishes
+        session = await load_session(user_id, context_id, exclusive=SERIALIZE_SESSION_REQUESTS)
+        tokens = []
+        try:
+            # Add user message to memory
+            session.add_message({"role": "user", "content": message})
+            model = resolve_model(user_id, context_id, session.model)
+
+            async for token in stream_llm_response(user_id, message, session.messages, context_id, model=model):
+                tokens.append(token)
+                yield token
+
+            # Add the complete assistant response to memory once streaming finishes
+            session.add_message({"role": "assistant", "content": "".join(tokens)})
+        finally:
+            try:
+                await session.flush()
+            finally:
+                session.release()
+
+        # Compress older turns in the background once the conversation grows long
+        maybe_schedule_summary(user_id, session.messages, context_id)
+
+    return token_stream()
+
+def _upload_message(filename: str, parsed_content: Dict[str, Any]) -> Any:
+    """Build the system message content for a parsed upload"""
+    if parsed_content["type"] == "image":
+        # For images, store the image reference and metadata
+        return parsed_content
+    if parsed_content["type"] == "document":
+        # For documents (PDF, DOCX), history only keeps a reference to the retrieval index,
+        # and each question sends just the chunks most relevant to it
+        system_message = {key: value for key, value in parsed_content.items() if key != "chunks"}
+        system_message.update(filename=filename, chunk_count=len(parsed_content["chunks"]))
+        return system_message
+    # For other text results, such as scanned PDFs with no extractable text
+    return f"Content from uploaded file '{filename}':\n{parsed_content['content']}"
+
+async def _parse_upload(filename: str, content: bytes, pages: Optional[str], semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+    """Parse one uploaded file and index it if it is a document"""
+    async with semaphore:
+        parsed_content = await parse_content(filename, content, pages)
+    if parsed_content["type"] == "document":
+        await asyncio.to_thread(document_index.put, parsed_content["doc_id"], parsed_content["chunks"])
+    return parsed_content
+
+async def upload(user_id: str, filename: str, content: bytes, question: Optional[str] = None, context_id: Optional[str] = None, pages: Optional[str] = None) -> str:
+    """Process an uploaded file and optionally answer a question about it
+
+    Args:
+        user_id: The Discord user ID
+        filename: The uploaded file's name
+        content: The uploaded file's raw bytes
+        question: Optional question to answer about the file
+        context_id: Optional context ID (thread_id or dm_channel_id)
+        pages: Optional page range of a PDF to read, such as "3-10"
+
+    Returns:
+        The LLM answer if a question was asked, otherwise a confirmation message
+
+    Raises:
+        ParserBusyError: If the document parser is saturated
+    """
+    return await upload_files(user_id, [(filename, content)], question, context_id, pages)
+
+async def upload_files(user_id: str, files: List[Tuple[str, bytes]], question: Optional[str] = None, context_id: Optional[str] = None, pages: Optional[str] = None) -> str:
+    """Process several uploaded files at once and optionally answer a question about them
+
+    Files are parsed in parallel, at most UPLOAD_PARSE_CONCURRENCY at a time,
+    and added to history in order with a single session write.
+
+    Args:
+        user_id: The Discord user ID
+        files: The uploaded files as (file name, raw bytes) tuples
+        question: Optional question to answer about the files
+        context_id: Optional context ID (thread_id or dm_channel_id)
+        pages: Optional page range to read from each PDF, such as "3-10"
+
+    Returns:
+        The LLM answer if a question was asked, otherwise a confirmation message
+
+    Raises:
+        ValueError: If no files or more than UPLOAD_MAX_FILES files are given
+        ParserBusyError: If the document parser is saturated
+    """
+    if not files:
+        raise ValueError("No files were uploaded.")
+    if len(files) > UPLOAD_MAX_FILES:
+        raise ValueError(f"Too many files. Upload at most {UPLOAD_MAX_FILES} at a time.")
+
+    # Parse every file concurrently, failing the whole upload if the parser is saturated
+    semaphore = asyncio.Semaphore(UPLOAD_PARSE_CONCURRENCY)
+    results = await asyncio.gather(*(_parse_upload(filename, content, pages, semaphore) for filename, content in files), return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+
+    filenames = [filename for filename, _ in files]
+    if len(files) == 1 and results[0]["type"] == "image":
+        response_message = f"Image '{filenames[0]}' uploaded and processed successfully. The AI can now see and analyze this image."
+    elif len(files) == 1:
+        response_message = f"File '{filenames[0]}' uploaded and processed successfully."
+    else:
+        response_message = f"{len(files)} files uploaded and processed successfully: " + ", ".join(f"'{filename}'" for filename in filenames) + "."
+
+    # Load the session once; it is flushed in a single write when the block exits
+    async with session_scope(user_id, context_id, exclusive=SERIALIZE_SESSION_REQUESTS) as session:
+        for filename, parsed_content in zip(filenames, results):
+            session.add_message({"role": "system", "content": _upload_message(filename, parsed_content)})
+
+        # If a question was provided, process it immediately
+        if not question:
+            return response_message
+
+        # Add user question to memory
+        session.add_message({"role": "user", "content": question})
+
+        # Get response from the LLM
+        model = resolve_model(user_id, context_id, session.model)
+        response = await get_llm_response(user_id, question, session.messages, context_id, model=model)
+
+        # Add assistant response to memory
+        session.add_message({"role": "assistant", "content": response})
+
+    # Compress older turns in the background once the conversation grows long
+    maybe_schedule_summary(user_id, session.messages, context_id)
+
+    return response
+
+async def set_model(user_id: str, model: str, context_id: Optional[str] = None) -> str:
+    """Set the LLM model for a specific user
+
+    Args:
+        user_id: The Discord user ID
+        model: The model to switch to
+        context_id: Optional context ID (thread_id or dm_channel_id)
+
+    Returns:
+        A confirmation message
+
+    Raises:
+        ValueError: If the model is not one of SELECTABLE_MODELS
+    """
+    # Validate model choice
+    if model not in SELECTABLE_MODELS:
+        raise ValueError(f"Invalid model. Choose from: {', '.join(SELECTABLE_MODELS)}")
+
+    # Set the user's model preference
+    await set_user_model(user_id, model, context_id)
+
+    return f"Model set to {model}"
+
+def get_metrics() -> Dict[str, Any]:
+    """Report runtime metrics for sizing the backend under load"""
+    return {
+        "provider_pool": provider_pool.stats(),
+        "storage_ops": get_storage_metrics(),
+        "storage": get_storage_stats(),
+        "session_expiry": session_expiry.stats(),
+        "response_cache": response_cache.stats(),
+        "parse_cache": parse_cache.stats(),
+        "parse_pool": parse_pool.stats(),
+        "image_parts": image_part_cache.stats(),
+        "retrieval": document_index.stats()
+    }
@@ -1,7 +1,8 @@
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Dict, List, Any, AsyncIterator, Optional, Tuple
 import time
-from backend.storage import MemoryStorage
-from backend.session_manager import SessionManager
+from contextlib import asynccontextmanager
+from backend.storage import AsyncMemoryStorage
+from backend.session_manager import SessionManager, SessionUnit
 
 # Maximum number of messages to keep in memory per session
 MAX_MEMORY_SIZE = 20
@@ -11,7 +12,7 @@ SESSION_TIMEOUT = 7200
 
 # Create a global session manager with in-memory storage
 # This can be replaced with database storage in the future
-_session_manager = SessionManager(MemoryStorage(), MAX_MEMORY_SIZE, SESSION_TIMEOUT)
+_session_manager = SessionManager(AsyncMemoryStorage(), MAX_MEMORY_SIZE, SESSION_TIMEOUT)
 
 def get_session_key(user_id: str, context_id: Optional[str] = None) -> str:
     """Generate a session key from user_id and optional context_id
@@ -25,7 +26,33 @@ def get_session_key(user_id: str, context_id: Optional[str] = None) -> str:
     """
     return _session_manager.get_session_key(user_id, context_id)
 
-def get_memory(user_id: str, context_id: Optional[str] = None) -> List[Dict[str, str]]:
+async def load_session(user_id: str, context_id: Optional[str] = None, exclusive: bool = False) -> SessionUnit:
+    """Load a session once for a request
+    
+    Args:
+        user_id: The Discord user ID
+        context_id: Optional context ID (thread_id or dm_channel_id)
+        exclusive: Whether to hold the session's lock until the unit is released
+        
+    Returns:
+        A unit of work over the session; call flush() to persist its changes,
+        and release() when an exclusive unit is done
+    """
+    return await _session_manager.load_session(user_id, context_id, exclusive)
+
+@asynccontextmanager
+async def session_scope(user_id: str, context_id: Optional[str] = None, exclusive: bool = False) -> AsyncIterator[SessionUnit]:
+    """Load a session, yield it for mutation, and flush it once when the block exits
+    
+    Args:
+        user_id: The Discord user ID
+        context_id: Optional context ID (thread_id or dm_channel_id)
+        exclusive: Whether to hold the session's lock for the whole block
+    """
+    async with _session_manager.session_scope(user_id, context_id, exclusive) as session:
+        yield session
+
+async def get_memory(user_id: str, context_id: Optional[str] = None) -> List[Dict[str, str]]:
     """Get the chat history for a specific session
     
     Args:
@@ -35,9 +62,9 @@ def get_memory(user_id: str, context_id: Optional[str] = None) -> List[Dict[str,
     Returns:
         The chat history for the specified session
     """
-    return _session_manager.get_memory(user_id, context_id)
+    return await _session_manager.get_memory(user_id, context_id)
 
-def add_to_memory(user_id: str, message: Dict[str, str], context_id: Optional[str] = None) -> None:
+async def add_to_memory(user_id: str, message: Dict[str, str], context_id: Optional[str] = None) -> None:
     """Add a message to the session's chat history
     
     Args:
@@ -45,9 +72,9 @@ def add_to_memory(user_id: str, message: Dict[str, str], context_id: Optional[st
         message: The message to add to the chat history
         context_id: Optional context ID (thread_id or dm_channel_id)
     """
-    _session_manager.add_to_memory(user_id, message, context_id)
+    await _session_manager.add_to_memory(user_id, message, context_id)
 
-def get_user_model(user_id: str, context_id: Optional[str] = None) -> str:
+async def get_user_model(user_id: str, context_id: Optional[str] = None) -> Optional[str]:
     """Get the model preference for a specific session
     
     Args:
@@ -57,9 +84,9 @@ def get_user_model(user_id: str, context_id: Optional[str] = None) -> str:
     Returns:
         The model preference for the specified session or default
     """
-    return _session_manager.get_user_model(user_id, context_id)
+    return await _session_manager.get_user_model(user_id, context_id)
 
-def set_user_model(user_id: str, model: str, context_id: Optional[str] = None) -> None:
+async def set_user_model(user_id: str, model: str, context_id: Optional[str] = None) -> None:
     """Set the model preference for a specific session
     
     Args:
@@ -67,15 +94,18 @@ def set_user_model(user_id: str, model: str, context_id: Optional[str] = None) -
         model: The model to set as preference
         context_id: Optional context ID (thread_id or dm_channel_id)
     """
-    _session_manager.set_user_model(user_id, model, context_id)
+    await _session_manager.set_user_model(user_id, model, context_id)
 
-def cleanup_sessions() -> int:
+async def cleanup_sessions(limit: Optional[int] = None) -> int:
     """Remove inactive sessions to free up memory
     
+    Args:
+        limit: Optional maximum number of sessions to remove in this call
+        
     Returns:
         The number of inactive sessions removed
     """
-    return _session_manager.cleanup_sessions()
+    return await _session_manager.cleanup_sessions(limit)
 
 # Function to change the storage backend
 def set_storage_backend(storage_backend) -> None:
@@ -85,4 +115,16 @@ def set_storage_backend(storage_backend) -> None:
         storage_backend: The new storage backend to use
     """
     global _session_manager
-    _session_manager = SessionManager(storage_backend, MAX_MEMORY_SIZE, SESSION_TIMEOUT)
\ No newline at end of file
+    _session_manager = SessionManager(storage_backend, MAX_MEMORY_SIZE, SESSION_TIMEOUT)
+
+async def close_storage_backend() -> None:
+    """Release the resources held by the current storage backend"""
+    await _session_manager.storage.close()
+
+def get_storage_metrics() -> Dict[str, int]:
+    """Get the total number of storage operations made, per operation name"""
+    return dict(_session_manager.storage.totals)
+
+def get_storage_stats() -> Dict[str, Any]:
+    """Get the storage backend's own metrics, such as cache hits and evictions"""
+    return _session_manager.storage.stats()
\ No newline at end of file
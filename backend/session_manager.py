@@ -1,13 +1,149 @@
-from typing import Dict, List, Any, Optional, Union
+from typing import Dict, List, Any, AsyncIterator, Optional, Union
 import time
-from backend.storage import StorageBackend, MemoryStorage
+import asyncio
+from collections import Counter
+from contextlib import asynccontextmanager
+from backend.storage import StorageBackend, AsyncStorageBackend, AsyncMemoryStorage, InstrumentedStorage, as_async_storage, trim_messages
+
+class SessionLocks:
+    """Per-session asyncio locks, created on first use and dropped once unused
+
+    Serializes writes to one session while different sessions proceed fully in
+    parallel. Locks are per process; every request for a session must be
+    handled by the same process for them to apply.
+    """
+
+    def __init__(self):
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Counter = Counter()
+
+    async def acquire(self, key: str) -> None:
+        """Wait for and take the lock for a session"""
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] += 1
+        try:
+            await lock.acquire()
+        except BaseException:
+            self._forget(key)
+            raise
+
+    def release(self, key: str) -> None:
+        """Release the lock for a session taken with acquire()"""
+        self._locks[key].release()
+        self._forget(key)
+
+    def _forget(self, key: str) -> None:
+        self._users[key] -= 1
+        if not self._users[key]:
+            del self._users[key]
+            del self._locks[key]
+
+    @asynccontextmanager
+    async def hold(self, key: str) -> AsyncIterator[None]:
+        """Hold the lock for a session for the duration of the block"""
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+class SessionUnit:
+    """A session loaded once for a request, mutated in memory and flushed once
+
+    Changes are tracked so that flush() writes only what changed: appended
+    messages go out as one batch append, and metadata is only updated when the
+    model changed. Rewriting the history (replace_messages) falls back to one
+    full-session write. A unit with no changes never writes.
+
+    Flushes take the session's lock. An exclusive unit holds the lock from load
+    until release(), so no other write to the session can interleave with it.
+    """
+
+    def __init__(self, storage: AsyncStorageBackend, session_key: str, session: Optional[Dict[str, Any]], max_messages: int, locks: Optional[SessionLocks] = None, exclusive: bool = False):
+        self.storage = storage
+        # An empty SessionLocks is falsy, so test for None to share the manager's locks
+        self.locks = locks if locks is not None else SessionLocks()
+        self.exclusive = exclusive
+        self.session_key = session_key
+        self.max_messages = max_messages
+        self.exists = session is not None
+        self.messages: List[Dict[str, Any]] = list(session["messages"]) if session else []
+        self.model: Optional[str] = session.get("model") if session else None
+        self._pending: List[Dict[str, Any]] = []
+        self._model_dirty = False
+        self._replaced = False
+
+    @property
+    def dirty(self) -> bool:
+        """Whether the unit has changes that flush() would write"""
+        return bool(self._pending) or self._model_dirty or self._replaced
+
+    def replace_messages(self, messages: List[Dict[str, Any]]) -> None:
+        """Replace the whole history, e.g. to fold older turns into a summary"""
+        self.messages = trim_messages(list(messages), self.max_messages)
+        self._pending = []
+        self._replaced = True
+
+    def add_message(self, message: Dict[str, Any]) -> None:
+        """Add a message to the history, trimming it the same way storage will"""
+        self.messages = trim_messages(self.messages + [message], self.max_messages)
+        self._pending.append(message)
+
+    def set_model(self, model: str) -> None:
+        """Set the model preference for the session"""
+        if model != self.model:
+            self.model = model
+            self._model_dirty = True
+
+    async def flush(self) -> None:
+        """Write the pending changes to storage, if there are any"""
+        if not self.dirty:
+            return
+
+        if self.exclusive:
+            await self._write()
+        else:
+            async with self.locks.hold(self.session_key):
+                await self._write()
+
+    def release(self) -> None:
+        """Release the session lock held by an exclusive unit"""
+        if self.exclusive:
+            self.exclusive = False
+            self.locks.release(self.session_key)
+
+    async def _write(self) -> None:
+        now = time.time()
+        if self._replaced:
+            # A rewritten history replaces the whole session, including metadata
+            await self.storage.set(self.session_key, {
+                "messages": self.messages,
+                "model": self.model,
+                "last_activity": now
+            })
+            self._replaced = False
+            self._pending = []
+            self._model_dirty = False
+        if self._pending:
+            await self.storage.append_messages(self.session_key, self._pending, self.max_messages, now)
+            self._pending = []
+        if self._model_dirty:
+            await self.storage.update_session(self.session_key, model=self.model, last_activity=now)
+            self._model_dirty = False
+        self.exists = True
 
 class SessionManager:
-    def __init__(self, storage_backend: StorageBackend = None, max_memory_size: int = 20, session_timeout: int = 7200):
-        # Use memory storage by default if no storage backend is provided
-        self.storage = storage_backend or MemoryStorage()
+    def __init__(self, storage_backend: Union[AsyncStorageBackend, StorageBackend] = None, max_memory_size: int = 20, session_timeout: int = 7200):
+        # Use memory storage by default if no storage backend is provided;
+        # blocking backends are adapted to the async interface, and every
+        # operation is counted so per-request storage traffic can be measured
+        self.storage = InstrumentedStorage(as_async_storage(storage_backend or AsyncMemoryStorage()))
         self.MAX_MEMORY_SIZE = max_memory_size
         self.SESSION_TIMEOUT = session_timeout
+        self.locks = SessionLocks()
     
     def get_session_key(self, user_id: str, context_id: Optional[str] = None) -> str:
         """Generate a session key from user_id and optional context_id
@@ -23,7 +159,49 @@ class SessionManager:
             return f"{user_id}:{context_id}"
         return user_id
     
-    def get_memory(self, user_id: str, context_id: Optional[str] = None) -> List[Dict[str, str]]:
+    async def load_session(self, user_id: str, context_id: Optional[str] = None, exclusive: bool = False) -> SessionUnit:
+        """Load a session once for a request
+
+        Args:
+            user_id: The Discord user ID
+            context_id: Optional context ID (thread_id or dm_channel_id)
+            exclusive: Whether to hold the session's lock until the unit is released
+
+        Returns:
+            A unit of work over the session; call flush() to persist its changes,
+            and release() when an exclusive unit is done
+        """
+        session_key = self.get_session_key(user_id, context_id)
+        if exclusive:
+            await self.locks.acquire(session_key)
+        try:
+            session = await self.storage.get(session_key)
+        except BaseException:
+            if exclusive:
+                self.locks.release(session_key)
+            raise
+        return SessionUnit(self.storage, session_key, session, self.MAX_MEMORY_SIZE, self.locks, exclusive)
+
+    @asynccontextmanager
+    async def session_scope(self, user_id: str, context_id: Optional[str] = None, exclusive: bool = False) -> AsyncIterator[SessionUnit]:
+        """Load a session, yield it for mutation, and flush it once when the block exits
+
+        Args:
+            user_id: The Discord user ID
+            context_id: Optional context ID (thread_id or dm_channel_id)
+            exclusive: Whether to hold the session's lock for the whole block, so
+                requests for the session run one at a time
+        """
+        unit = await self.load_session(user_id, context_id, exclusive)
+        try:
+            yield unit
+        finally:
+            try:
+                await unit.flush()
+            finally:
+                unit.release()
+
+    async def get_memory(self, user_id: str, context_id: Optional[str] = None) -> List[Dict[str, str]]:
         """Get the chat history for a specific session
         
         Args:
@@ -36,25 +214,12 @@ class SessionManager:
         # Generate session key
         session_key = self.get_session_key(user_id, context_id)
         
-        # Get session from storage
-        session = self.storage.get(session_key)
-        
-        # Create session if it doesn't exist
-        if not session:
-            session = {
-                "messages": [],
-                "model": None,
-                "last_activity": time.time()
-            }
-            self.storage.set(session_key, session)
-        else:
-            # Update last activity timestamp
-            session["last_activity"] = time.time()
-            self.storage.set(session_key, session)
+        # Get session from storage; reading never writes
+        session = await self.storage.get(session_key)
         
-        return session["messages"]
+        return session["messages"] if session else []
     
-    def add_to_memory(self, user_id: str, message: Dict[str, str], context_id: Optional[str] = None) -> None:
+    async def add_to_memory(self, user_id: str, message: Dict[str, str], context_id: Optional[str] = None) -> None:
         """Add a message to the session's chat history
         
         Args:
@@ -65,39 +230,11 @@ class SessionManager:
         # Generate session key
         session_key = self.get_session_key(user_id, context_id)
         
-        # Get session from storage
-        session = self.storage.get(session_key)
-        
-        # Create session if it doesn't exist
-        if not session:
-            session = {
-                "messages": [],
-                "model": None,
-                "last_activity": time.time()
-            }
-        
-        # Add message to memory
-        session["messages"].append(message)
-        
-        # Update last activity timestamp
-        session["last_activity"] = time.time()
-        
-        # Trim memory if it exceeds the maximum size
-        if len(session["messages"]) > self.MAX_MEMORY_SIZE:
-            # Remove oldest messages, but keep system messages
-            system_messages = [msg for msg in session["messages"] if msg["role"] == "system"]
-            other_messages = [msg for msg in session["messages"] if msg["role"] != "system"]
-            
-            # Keep only the most recent messages
-            other_messages = other_messages[-(self.MAX_MEMORY_SIZE - len(system_messages)):]
-            
-            # Combine system messages with recent messages
-            session["messages"] = system_messages + other_messages
-        
-        # Save session to storage
-        self.storage.set(session_key, session)
+        # Append the message and trim the oldest non-system messages beyond the limit
+        async with self.locks.hold(session_key):
+            await self.storage.append_messages(session_key, [message], self.MAX_MEMORY_SIZE, time.time())
     
-    def get_user_model(self, user_id: str, context_id: Optional[str] = None) -> str:
+    async def get_user_model(self, user_id: str, context_id: Optional[str] = None) -> Optional[str]:
         """Get the model preference for a specific session
         
         Args:
@@ -110,22 +247,15 @@ class SessionManager:
         # Generate session key
         session_key = self.get_session_key(user_id, context_id)
         
-        # Get session from storage
-        session = self.storage.get(session_key)
-        
-        # Create session if it doesn't exist
-        if not session:
-            session = {
-                "messages": [],
-                "model": None,
-                "last_activity": time.time()
-            }
-            self.storage.set(session_key, session)
+        # Get session from storage; reading never writes
+        session = await self.storage.get(session_key)
         
         # Return user's model preference or default
+        if not session:
+            return None
         return session.get("model", "gpt-4o")
     
-    def set_user_model(self, user_id: str, model: str, context_id: Optional[str] = None) -> None:
+    async def set_user_model(self, user_id: str, model: str, context_id: Optional[str] = None) -> None:
         """Set the model preference for a specific session
         
         Args:
@@ -136,45 +266,19 @@ class SessionManager:
         # Generate session key
         session_key = self.get_session_key(user_id, context_id)
         
-        # Get session from storage
-        session = self.storage.get(session_key)
-        
-        # Create session if it doesn't exist
-        if not session:
-            session = {
-                "messages": [],
-                "model": None,
-                "last_activity": time.time()
-            }
-        
-        # Set model preference
-        session["model"] = model
-        
-        # Update last activity timestamp
-        session["last_activity"] = time.time()
-        
-        # Save session to storage
-        self.storage.set(session_key, session)
+        # Set model preference and update last activity timestamp in place
+        async with self.locks.hold(session_key):
+            await self.storage.update_session(session_key, model=model, last_activity=time.time())
     
-    def cleanup_sessions(self) -> int:
+    async def cleanup_sessions(self, limit: Optional[int] = None) -> int:
         """Remove inactive sessions to free up memory
         
+        Args:
+            limit: Optional maximum number of sessions to remove in this call
+            
         Returns:
             The number of inactive sessions removed
         """
-        current_time = time.time()
-        inactive_sessions = []
-        
-        # Get all sessions
-        all_sessions = self.storage.get_all()
-        
-        # Find inactive sessions
-        for session_key, session in all_sessions.items():
-            if current_time - session["last_activity"] > self.SESSION_TIMEOUT:
-                inactive_sessions.append(session_key)
-        
-        # Remove inactive sessions
-        for session_key in inactive_sessions:
-            self.storage.delete(session_key)
-        
-        return len(inactive_sessions)
\ No newline at end of file
+        # Let the backend evict through its last-activity index, oldest first
+        cutoff = time.time() - self.SESSION_TIMEOUT
+        return await self.storage.expire_sessions(cutoff, limit)
\ No newline at end of file
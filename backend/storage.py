@@ -1,6 +1,58 @@
-from typing import Dict, List, Any, Optional, Protocol, Union
+from typing import Dict, List, Any, Iterator, Optional, Protocol, Tuple, Union
+import sys
 import time
+import heapq
+import asyncio
+import threading
 from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+def new_session(last_activity: Optional[float] = None) -> Dict[str, Any]:
+    """Create an empty session record"""
+    return {
+        "messages": [],
+        "model": None,
+        "last_activity": time.time() if last_activity is None else last_activity
+    }
+
+def trim_messages(messages: List[Dict[str, Any]], max_messages: int) -> List[Dict[str, Any]]:
+    """Trim a message list to at most max_messages, keeping every system message
+
+    The oldest non-system messages are removed first, and the order of the kept
+    messages is unchanged, matching how the SQLite backend trims stored history.
+    """
+    if len(messages) <= max_messages:
+        return messages
+
+    system_count = sum(1 for msg in messages if msg["role"] == "system")
+    drop = len(messages) - system_count - max(max_messages - system_count, 0)
+
+    # Remove the oldest non-system messages in place, without reordering the rest
+    trimmed = []
+    for msg in messages:
+        if drop > 0 and msg["role"] != "system":
+            drop -= 1
+            continue
+        trimmed.append(msg)
+    return trimmed
+
+def estimate_size(value: Any) -> int:
+    """Estimate the memory a session record holds, in bytes
+
+    Walks nested dicts and lists so inline attachment payloads (such as legacy
+    base64 images) are counted. Blob references count only the reference itself,
+    since their bytes live on disk.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
 
 # Define the interface for storage backends
 class StorageBackend(ABC):
@@ -24,16 +76,75 @@ class StorageBackend(ABC):
         """Get all sessions"""
         pass
 
+    def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        """Append messages to a session in one write, creating it if needed, and trim its history
+
+        Backends that store messages individually should override this with an
+        incremental append instead of rewriting the whole session.
+        """
+        session = self.get(key) or new_session(last_activity)
+        session["messages"] = trim_messages(session["messages"] + list(messages), max_messages)
+        session["last_activity"] = last_activity
+        self.set(key, session)
+
+    def update_session(self, key: str, **fields: Any) -> None:
+        """Update session metadata fields (model, last_activity), creating the session if needed
+
+        Backends that store metadata separately should override this with an
+        in-place update instead of rewriting the whole session.
+        """
+        session = self.get(key) or new_session()
+        session.update(fields)
+        self.set(key, session)
+
+    def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        """Delete sessions whose last activity is older than cutoff
+
+        This default scans every session; backends should override it with an
+        index on last activity so the cost is proportional to what is evicted.
+
+        Args:
+            cutoff: Sessions with last_activity before this timestamp are deleted
+            limit: Optional maximum number of sessions to delete in one call
+
+        Returns:
+            The number of sessions deleted
+        """
+        expired = [key for key, session in self.get_all().items() if session["last_activity"] < cutoff]
+        expired.sort(key=lambda key: self.get(key)["last_activity"])
+        if limit is not None:
+            expired = expired[:limit]
+        for key in expired:
+            self.delete(key)
+        return len(expired)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get backend-specific metrics"""
+        return {}
+
+    def close(self) -> None:
+        """Release any resources held by the backend"""
+        pass
+
 # In-memory storage implementation
 class MemoryStorage(StorageBackend):
     def __init__(self):
         self.data: Dict[str, Dict[str, Any]] = {}
+        # Min-heap of (last_activity, key) for expiry; entries go stale when a
+        # session is touched again and are skipped lazily when popped
+        self._expiry_heap: List[Tuple[float, str]] = []
     
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         return self.data.get(key)
     
     def set(self, key: str, data: Dict[str, Any]) -> None:
         self.data[key] = data
+        heapq.heappush(self._expiry_heap, (data.get("last_activity", 0), key))
+
+        # Rebuild the heap once stale entries dominate it
+        if len(self._expiry_heap) > 2 * len(self.data) + 64:
+            self._expiry_heap = [(session.get("last_activity", 0), k) for k, session in self.data.items()]
+            heapq.heapify(self._expiry_heap)
     
     def delete(self, key: str) -> None:
         if key in self.data:
@@ -42,6 +153,161 @@ class MemoryStorage(StorageBackend):
     def get_all(self) -> Dict[str, Dict[str, Any]]:
         return self.data
 
+    def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        """Delete sessions idle since before cutoff, oldest first, via the expiry heap
+
+        Every heap entry popped counts toward limit, stale or not, so one call
+        does a bounded amount of work.
+        """
+        evicted = popped = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < cutoff:
+            if limit is not None and popped >= limit:
+                break
+            last_activity, key = heapq.heappop(self._expiry_heap)
+            popped += 1
+            session = self.data.get(key)
+            # Stale entry: the session was deleted, or touched since, and set() already indexed its current time
+            if session is None or session.get("last_activity", 0) != last_activity:
+                continue
+            self._discard(key)
+            evicted += 1
+        return evicted
+
+    def _discard(self, key: str) -> None:
+        """Remove a session from memory"""
+        self.data.pop(key, None)
+
+# Bounded in-memory storage that evicts least-recently-used sessions
+class LRUMemoryStorage(MemoryStorage):
+    """In-memory storage capped by session count and total size
+
+    When either cap is exceeded, the least recently used sessions are evicted.
+    With a spill backend they are written there and reloaded on the next access;
+    without one they are dropped. Safe to call from several threads.
+    """
+
+    def __init__(self, max_sessions: int = 0, max_bytes: int = 0, spill: Optional[StorageBackend] = None):
+        """Initialize the bounded memory storage
+
+        Args:
+            max_sessions: Maximum number of sessions held in memory (0 for no limit)
+            max_bytes: Maximum estimated bytes held in memory (0 for no limit)
+            spill: Optional backend that evicted sessions are written to instead of being dropped
+        """
+        super().__init__()
+        self.data: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.spill = spill
+
+        self._sizes: Dict[str, int] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+        self.counters: Counter = Counter()
+
+    def _load(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a session and mark it recently used, reloading it from the spill backend if needed"""
+        session = self.data.get(key)
+        if session is not None:
+            self.data.move_to_end(key)
+            return session
+
+        if self.spill is None:
+            return None
+
+        session = self.spill.get(key)
+        if session is not None:
+            self.counters["spill_hits"] += 1
+            self.spill.delete(key)
+            self._store(key, session)
+        return session
+
+    def _store(self, key: str, data: Dict[str, Any]) -> None:
+        """Insert or replace a session, then evict down to the caps"""
+        super().set(key, data)
+        self.data.move_to_end(key)
+
+        size = estimate_size(data)
+        self._total_bytes += size - self._sizes.get(key, 0)
+        self._sizes[key] = size
+
+        # Evict from the least recently used end, never the session just written
+        while len(self.data) > 1 and (
+            (self.max_sessions and len(self.data) > self.max_sessions) or
+            (self.max_bytes and self._total_bytes > self.max_bytes)
+        ):
+            old_key, old_session = self.data.popitem(last=False)
+            self._total_bytes -= self._sizes.pop(old_key, 0)
+            self.counters["evictions"] += 1
+            if self.spill is not None:
+                self.spill.set(old_key, old_session)
+                self.counters["spilled"] += 1
+
+    def _discard(self, key: str) -> None:
+        """Remove a session from memory only"""
+        if self.data.pop(key, None) is not None:
+            self._total_bytes -= self._sizes.pop(key, 0)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session = self._load(key)
+            self.counters["hits" if session is not None else "misses"] += 1
+            return session
+
+    def set(self, key: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            self._store(key, data)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._discard(key)
+            if self.spill is not None:
+                self.spill.delete(key)
+
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            sessions = self.spill.get_all() if self.spill is not None else {}
+            sessions.update(self.data)
+            return sessions
+
+    def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        with self._lock:
+            session = self._load(key) or new_session(last_activity)
+            session["messages"] = trim_messages(session["messages"] + list(messages), max_messages)
+            session["last_activity"] = last_activity
+            self._store(key, session)
+
+    def update_session(self, key: str, **fields: Any) -> None:
+        with self._lock:
+            session = self._load(key) or new_session()
+            session.update(fields)
+            self._store(key, session)
+
+    def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        with self._lock:
+            evicted = super().expire_sessions(cutoff, limit)
+            if self.spill is not None and (limit is None or evicted < limit):
+                evicted += self.spill.expire_sessions(cutoff, None if limit is None else limit - evicted)
+            return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self.data),
+                "bytes": self._total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_bytes": self.max_bytes,
+                "hits": self.counters["hits"],
+                "misses": self.counters["misses"],
+                "evictions": self.counters["evictions"],
+                "spilled": self.counters["spilled"],
+                "spill_hits": self.counters["spill_hits"]
+            }
+
+    def close(self) -> None:
+        if self.spill is not None:
+            self.spill.close()
+
 # Database storage implementation (placeholder for future implementation)
 class DatabaseStorage(StorageBackend):
     def __init__(self, connection_string: str):
@@ -67,4 +333,351 @@ class DatabaseStorage(StorageBackend):
     def get_all(self) -> Dict[str, Dict[str, Any]]:
         # Placeholder for database implementation
         # Would return all sessions from the database
-        raise NotImplementedError("Database storage not yet implemented")
\ No newline at end of file
+        raise NotImplementedError("Database storage not yet implemented")
+
+# Define the async interface for storage backends used by the session layer
+class AsyncStorageBackend(ABC):
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get a session by key"""
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, data: Dict[str, Any]) -> None:
+        """Set or update a session"""
+        pass
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        """Delete a session"""
+        pass
+
+    @abstractmethod
+    async def get_all(self) -> Dict[str, Dict[str, Any]]:
+        """Get all sessions"""
+        pass
+
+    @abstractmethod
+    async def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        """Append messages to a session in one write, creating it if needed, and trim its history"""
+        pass
+
+    @abstractmethod
+    async def update_session(self, key: str, **fields: Any) -> None:
+        """Update session metadata fields (model, last_activity), creating the session if needed"""
+        pass
+
+    @abstractmethod
+    async def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        """Delete up to limit sessions idle since before cutoff, returning how many were deleted"""
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Get backend-specific metrics"""
+        return {}
+
+    async def close(self) -> None:
+        """Release any resources held by the backend"""
+        pass
+
+# Async in-memory storage, which never blocks so calls run inline on the event loop
+class AsyncMemoryStorage(AsyncStorageBackend):
+    def __init__(self, storage: Optional[MemoryStorage] = None):
+        self.storage = storage or MemoryStorage()
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.storage.get(key)
+
+    async def set(self, key: str, data: Dict[str, Any]) -> None:
+        self.storage.set(key, data)
+
+    async def delete(self, key: str) -> None:
+        self.storage.delete(key)
+
+    async def get_all(self) -> Dict[str, Dict[str, Any]]:
+        return self.storage.get_all()
+
+    async def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        self.storage.append_messages(key, messages, max_messages, last_activity)
+
+    async def update_session(self, key: str, **fields: Any) -> None:
+        self.storage.update_session(key, **fields)
+
+    async def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        return self.storage.expire_sessions(cutoff, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.storage.stats()
+
+    async def close(self) -> None:
+        self.storage.close()
+
+# Async adapter that runs a blocking storage backend on dedicated I/O threads
+class ThreadedStorage(AsyncStorageBackend):
+    def __init__(self, storage: StorageBackend, max_workers: int = 4):
+        self.storage = storage
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="storage-io")
+
+    async def _run(self, func, *args, **kwargs) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return await self._run(self.storage.get, key)
+
+    async def set(self, key: str, data: Dict[str, Any]) -> None:
+        await self._run(self.storage.set, key, data)
+
+    async def delete(self, key: str) -> None:
+        await self._run(self.storage.delete, key)
+
+    async def get_all(self) -> Dict[str, Dict[str, Any]]:
+        return await self._run(self.storage.get_all)
+
+    async def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        await self._run(self.storage.append_messages, key, messages, max_messages, last_activity)
+
+    async def update_session(self, key: str, **fields: Any) -> None:
+        await self._run(self.storage.update_session, key, **fields)
+
+    async def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        return await self._run(self.storage.expire_sessions, cutoff, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.storage.stats()
+
+    async def close(self) -> None:
+        await self._run(self.storage.close)
+        self._executor.shutdown(wait=True)
+
+# Async write-through cache that serves recently used sessions from memory
+class CachedStorage(AsyncStorageBackend):
+    """Write-through LRU session cache layered over another async backend
+
+    Reads of cached sessions never touch the backend. Every write goes to the
+    backend first and is then applied to the cached copy, so the backend stays
+    the durable source of truth. If writes to the same session overlap, or a
+    write races a cache fill, the cached copy is dropped and reloaded on the
+    next read rather than risk serving a stale session.
+    """
+
+    def __init__(self, storage: AsyncStorageBackend, max_sessions: int = 1000):
+        """Initialize the cache
+
+        Args:
+            storage: The backend to cache
+            max_sessions: Maximum number of sessions held in the cache
+        """
+        self.storage = storage
+        self.max_sessions = max_sessions
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        # Bumped on every write, so a cache fill can tell it raced a write. Kept only
+        # while a read or write of the session is in flight, so it doesn't grow with every key
+        self._generations: Counter = Counter()
+        # Reads and writes in flight per session, and sessions whose writes overlapped
+        self._reading: Counter = Counter()
+        self._inflight: Counter = Counter()
+        self._overlapped: set = set()
+        self.counters: Counter = Counter()
+
+    @staticmethod
+    def _copy(session: Dict[str, Any]) -> Dict[str, Any]:
+        # Callers may mutate what they get back, so never hand out the cached record
+        return {**session, "messages": list(session["messages"])}
+
+    def _put(self, key: str, session: Dict[str, Any]) -> None:
+        self._cache[key] = session
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_sessions:
+            self._cache.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _release(self, key: str) -> None:
+        """Forget a session's generation once nothing is reading or writing it"""
+        if not self._inflight[key] and not self._reading[key]:
+            self._generations.pop(key, None)
+
+    def _invalidate(self, key: str) -> None:
+        if self._cache.pop(key, None) is not None:
+            self.counters["invalidations"] += 1
+
+    async def _write(self, key: str, write, apply) -> bool:
+        """Write through to the backend, then apply the change to the cached copy
+
+        Args:
+            key: The session key
+            write: Coroutine performing the backend write
+            apply: Function updating the cached session in place, or None to invalidate it
+
+        Returns:
+            True if no other write to the session overlapped this one
+        """
+        self._generations[key] += 1
+        if self._inflight[key]:
+            self._overlapped.add(key)
+        self._inflight[key] += 1
+        try:
+            await write
+        except BaseException:
+            self._invalidate(key)
+            raise
+        finally:
+            self._inflight[key] -= 1
+            overlapped = key in self._overlapped
+            if not self._inflight[key]:
+                del self._inflight[key]
+                self._overlapped.discard(key)
+                self._release(key)
+
+        if overlapped or apply is None:
+            # Overlapping writes may have completed out of order, so the cached copy is unreliable
+            self._invalidate(key)
+        elif key in self._cache:
+            apply(self._cache[key])
+            self._cache.move_to_end(key)
+        return not overlapped
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        session = self._cache.get(key)
+        if session is not None:
+            self.counters["hits"] += 1
+            self._cache.move_to_end(key)
+            return self._copy(session)
+
+        self.counters["misses"] += 1
+        generation = self._generations[key]
+        self._reading[key] += 1
+        try:
+            session = await self.storage.get(key)
+
+            # Only cache what was read if no write to the session started meanwhile
+            if session is not None and self._generations[key] == generation and not self._inflight[key]:
+                self._put(key, self._copy(session))
+            return session
+        finally:
+            self._reading[key] -= 1
+            if not self._reading[key]:
+                del self._reading[key]
+                self._release(key)
+
+    async def set(self, key: str, data: Dict[str, Any]) -> None:
+        if await self._write(key, self.storage.set(key, data), None):
+            self._put(key, self._copy(data))
+
+    async def delete(self, key: str) -> None:
+        await self._write(key, self.storage.delete(key), None)
+
+    async def get_all(self) -> Dict[str, Dict[str, Any]]:
+        return await self.storage.get_all()
+
+    async def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        def apply(session: Dict[str, Any]) -> None:
+            session["messages"] = trim_messages(session["messages"] + list(messages), max_messages)
+            session["last_activity"] = last_activity
+
+        await self._write(key, self.storage.append_messages(key, messages, max_messages, last_activity), apply)
+
+    async def update_session(self, key: str, **fields: Any) -> None:
+        def apply(session: Dict[str, Any]) -> None:
+            session.update(fields)
+
+        await self._write(key, self.storage.update_session(key, **fields), apply)
+
+    async def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        evicted = await self.storage.expire_sessions(cutoff, limit)
+        if evicted:
+            # The backend doesn't report which sessions it deleted, so drop every idle cached copy
+            for key in [key for key, session in self._cache.items() if session["last_activity"] < cutoff]:
+                self._invalidate(key)
+        return evicted
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.storage.stats(),
+            "cache": {
+                "sessions": len(self._cache),
+                "max_sessions": self.max_sessions,
+                "hits": self.counters["hits"],
+                "misses": self.counters["misses"],
+                "evictions": self.counters["evictions"],
+                "invalidations": self.counters["invalidations"],
+                "tracked_keys": len(self._generations)
+            }
+        }
+
+    async def close(self) -> None:
+        self._cache.clear()
+        await self.storage.close()
+
+# Storage operation counts for the current request, set by count_storage_ops
+_request_storage_ops: ContextVar[Optional[Counter]] = ContextVar("request_storage_ops", default=None)
+
+@contextmanager
+def count_storage_ops() -> Iterator[Counter]:
+    """Count the storage operations made within this block, per operation name
+
+    Counts include operations made by tasks spawned inside the block.
+    """
+    counts: Counter = Counter()
+    token = _request_storage_ops.set(counts)
+    try:
+        yield counts
+    finally:
+        _request_storage_ops.reset(token)
+
+# Async wrapper that counts every storage operation, in total and per request
+class InstrumentedStorage(AsyncStorageBackend):
+    def __init__(self, storage: AsyncStorageBackend):
+        self.storage = storage
+        self.totals: Counter = Counter()
+
+    def _record(self, op: str) -> None:
+        self.totals[op] += 1
+        counts = _request_storage_ops.get()
+        if counts is not None:
+            counts[op] += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        self._record("get")
+        return await self.storage.get(key)
+
+    async def set(self, key: str, data: Dict[str, Any]) -> None:
+        self._record("set")
+        await self.storage.set(key, data)
+
+    async def delete(self, key: str) -> None:
+        self._record("delete")
+        await self.storage.delete(key)
+
+    async def get_all(self) -> Dict[str, Dict[str, Any]]:
+        self._record("get_all")
+        return await self.storage.get_all()
+
+    async def append_messages(self, key: str, messages: List[Dict[str, Any]], max_messages: int, last_activity: float) -> None:
+        self._record("append_messages")
+        await self.storage.append_messages(key, messages, max_messages, last_activity)
+
+    async def update_session(self, key: str, **fields: Any) -> None:
+        self._record("update_session")
+        await self.storage.update_session(key, **fields)
+
+    async def expire_sessions(self, cutoff: float, limit: Optional[int] = None) -> int:
+        self._record("expire_sessions")
+        return await self.storage.expire_sessions(cutoff, limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.storage.stats()
+
+    async def close(self) -> None:
+        await self.storage.close()
+
+def as_async_storage(storage: Union[StorageBackend, AsyncStorageBackend]) -> AsyncStorageBackend:
+    """Adapt a storage backend to the async interface
+
+    In-memory storage runs inline; any other blocking backend runs on I/O threads.
+    """
+    if isinstance(storage, AsyncStorageBackend):
+        return storage
+    if isinstance(storage, MemoryStorage):
+        return AsyncMemoryStorage(storage)
+    return ThreadedStorage(storage)
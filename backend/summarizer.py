@@ -0,0 +1,120 @@
+import os
+import json
+import asyncio
+from collections import Counter
+from typing import Dict, List, Any, Optional, Set
+from dotenv import load_dotenv
+from backend.session import get_session_key, session_scope
+from models.gemini import generate_gemini
+from utils.logger import get_logger
+
+# Load environment variables
+load_dotenv()
+
+# Set up logger
+logger = get_logger("summarizer")
+
+# Whether long conversations are compressed into a running summary
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "false").lower() == "true"
+
+# Cheap Gemini model used to write summaries
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "gemini-2.0-flash")
+
+# Number of conversation turns that triggers a summary
+SUMMARY_TRIGGER = int(os.getenv("SUMMARY_TRIGGER", "14"))
+
+# Number of most recent turns always kept verbatim
+SUMMARY_KEEP_RECENT = int(os.getenv("SUMMARY_KEEP_RECENT", "6"))
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+# Session keys with a summary job in flight, and the running jobs
+_in_flight: Set[str] = set()
+_tasks: Set[asyncio.Task] = set()
+
+def _is_summary(message: Dict[str, Any]) -> bool:
+    return message.get("summary", False)
+
+def _turns(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Conversation turns, i.e. everything except system messages and summaries"""
+    return [msg for msg in messages if msg["role"] != "system"]
+
+def _build_prompt(summary: Optional[str], turns: List[Dict[str, Any]]) -> str:
+    """Build the summarization prompt from the previous summary and the turns to fold in"""
+    lines = [
+        "Summarize the following conversation between a user and an AI assistant.",
+        "Keep facts, decisions, names and open questions the assistant needs to continue the conversation.",
+        "Be concise and write in plain prose."
+    ]
+    if summary:
+        lines.append(f"\nSummary so far:\n{summary}")
+    lines.append("\nConversation:")
+    for msg in turns:
+        speaker = "User" if msg["role"] == "user" else "Assistant"
+        lines.append(f"{speaker}: {msg['content']}")
+    return "\n".join(lines)
+
+def maybe_schedule_summary(user_id: str, messages: List[Dict[str, Any]], context_id: Optional[str] = None) -> None:
+    """Start a background summary job if the conversation has grown past the trigger
+
+    Runs off the request path; at most one job per session is in flight.
+
+    Args:
+        user_id: The Discord user ID
+        messages: The session's chat history after the request
+        context_id: Optional context ID (thread_id or dm_channel_id)
+    """
+    if not SUMMARY_ENABLED or len(_turns(messages)) < SUMMARY_TRIGGER:
+        return
+
+    session_key = get_session_key(user_id, context_id)
+    if session_key in _in_flight:
+        return
+
+    _in_flight.add(session_key)
+    task = asyncio.create_task(_summarize(user_id, context_id, session_key))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+
+async def _summarize(user_id: str, context_id: Optional[str], session_key: str) -> None:
+    """Fold all but the most recent turns into the session's running summary"""
+    try:
+        # Pick the older turns from a snapshot of the session
+        async with session_scope(user_id, context_id) as session:
+            turns = _turns(session.messages)
+            summaries = [msg for msg in session.messages if _is_summary(msg)]
+        to_fold = turns[:-SUMMARY_KEEP_RECENT] if SUMMARY_KEEP_RECENT else turns
+        if not to_fold:
+            return
+
+        previous = summaries[-1]["content"][len(SUMMARY_PREFIX):] if summaries else None
+        summary = await generate_gemini(_build_prompt(previous, to_fold), SUMMARY_MODEL)
+
+        # Reload and rewrite under the session lock, since new turns may have arrived
+        # while the model was running and none may land between the reload and the rewrite
+        async with session_scope(user_id, context_id, exclusive=True) as session:
+            folded = Counter(json.dumps(msg, sort_keys=True) for msg in to_fold)
+            kept = []
+            for msg in session.messages:
+                key = json.dumps(msg, sort_keys=True)
+                if _is_summary(msg):
+                    continue
+                if msg["role"] != "system" and folded[key] > 0:
+                    folded[key] -= 1
+                    continue
+                kept.append(msg)
+
+            summary_message = {"role": "system", "content": SUMMARY_PREFIX + summary, "summary": True}
+            session.replace_messages([summary_message] + kept)
+
+        logger.info(f"Summarized {len(to_fold)} turns for session {session_key}")
+    except Exception as e:
+        logger.error(f"Error summarizing session {session_key}: {str(e)}")
+    finally:
+        _in_flight.discard(session_key)
+
+async def cancel_summaries() -> None:
+    """Cancel summary jobs still running, e.g. on shutdown"""
+    for task in list(_tasks):
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
@@ -0,0 +1,58 @@
+"""Per-request provider client overhead
+
+Measures the client setup each request pays before calling a provider: the
+original code built a new ChatOpenAI or GenerativeModel per request, while
+the wrappers now look up a shared client in the registry. No API calls are
+made, so the connection setup and TLS handshakes a fresh client also repeats
+are not included; the numbers are a lower bound on what is saved.
+
+Usage:
+    python -m benchmarks.client_overhead [--requests 200]
+"""
+import os
+import time
+import argparse
+from typing import Callable
+
+# Clients are only constructed, never used, so a placeholder key is enough
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import google.generativeai as genai
+from langchain_openai import ChatOpenAI
+from models.gpt import get_gpt_client
+from models.gemini import get_gemini_client
+
+def per_request_gpt() -> ChatOpenAI:
+    """The original call_gpt setup"""
+    return ChatOpenAI(model_name="gpt-4o", temperature=0.7, streaming=False, openai_proxy=None)
+
+def per_request_gemini() -> genai.GenerativeModel:
+    """The original call_gemini setup"""
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    return genai.GenerativeModel("gemini-2.0-flash")
+
+def time_per_call(func: Callable[[], object], requests: int) -> float:
+    """Average microseconds per call, after one warm-up call"""
+    func()
+    start = time.perf_counter()
+    for _ in range(requests):
+        func()
+    return (time.perf_counter() - start) / requests * 1e6
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200, help="Simulated requests per measurement")
+    args = parser.parse_args()
+
+    cases = [
+        ("gpt-4o", per_request_gpt, get_gpt_client),
+        ("gemini-2.0-flash", per_request_gemini, lambda: get_gemini_client("gemini-2.0-flash"))
+    ]
+    for model, before, after in cases:
+        before_us = time_per_call(before, args.requests)
+        after_us = time_per_call(after, args.requests)
+        print(f"{model:<18} per-request client {before_us:>9.1f} us   shared client {after_us:>7.2f} us   ({before_us / after_us:,.0f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Stored and sent sizes of uploaded images
+
+Builds a synthetic corpus: a 12 MP photo, an EXIF-rotated photo, a
+screenshot and a transparent PNG. Each image goes through preprocess_image,
+as on upload, and then through image_for_model for every model. The script
+reports the stored size and the bytes sent to each model, compared with the
+original upload, which used to be stored and sent as-is. It also reports the
+preprocessing time and the time to prepare each model's variant.
+
+Usage:
+    python -m benchmarks.image_corpus
+"""
+import time
+import tempfile
+import utils.blob_store
+from benchmarks.samples import make_photo, make_screenshot, make_transparent_png
+from utils import image_pipeline
+from utils.blob_store import BlobStore
+from utils.image_pipeline import (
+    preprocess_image, image_for_model, MODEL_IMAGE_LIMITS,
+    IMAGE_MAX_DIMENSION, IMAGE_MAX_BYTES, IMAGE_QUALITY, IMAGE_THUMBNAIL_SIZE
+)
+
+def kib(size: int) -> str:
+    return f"{size / 1024:,.0f} KiB"
+
+def main() -> None:
+    corpus = [
+        ("12 MP photo", make_photo((4000, 3000))),
+        ("rotated photo", make_photo((4000, 3000), orientation=6, seed=1)),
+        ("screenshot", make_screenshot()),
+        ("transparent png", make_transparent_png())
+    ]
+
+    with tempfile.TemporaryDirectory() as root:
+        # Keep the benchmark's blobs out of the real store
+        store = BlobStore(root)
+        image_pipeline.blob_store = store
+        utils.blob_store.blob_store = store
+
+        for name, content in corpus:
+            start = time.perf_counter()
+            image = preprocess_image(content, IMAGE_MAX_DIMENSION, IMAGE_MAX_BYTES, IMAGE_QUALITY, IMAGE_THUMBNAIL_SIZE)
+            preprocess_ms = (time.perf_counter() - start) * 1000
+
+            print(
+                f"{name}: upload {kib(len(content))} {image['original_width']}x{image['original_height']} {image['source_format']}, "
+                f"stored {kib(len(image['data']))} {image['width']}x{image['height']} {image['format']} in {preprocess_ms:.0f} ms"
+            )
+
+            image_data = {"blob": store.put(image["data"]), "mime_type": image["mime_type"], "width": image["width"], "height": image["height"]}
+            for model in MODEL_IMAGE_LIMITS:
+                start = time.perf_counter()
+                image_b64, mime_type = image_for_model(image_data, model)
+                prepare_ms = (time.perf_counter() - start) * 1000
+                # Base64 adds a third; the original upload was sent base64-encoded too
+                sent, original = len(image_b64), -(-len(content) // 3) * 4
+                print(f"    {model:<28} sent {kib(sent):>10} {mime_type:<11} ({sent / original:.0%} of the original) prepared in {prepare_ms:.0f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""/chat latency while large PDFs parse
+
+Parses several large PDFs concurrently and, meanwhile, sends a /chat message
+through the service layer every few milliseconds, recording each message's
+latency and the event loop's scheduling lag. Compares parsing in the parse
+process pool with parsing inline on the event loop, as uploads used to. The
+LLM call is replaced by an instant reply, so any delay comes from parsing.
+
+Usage:
+    python -m benchmarks.parse_latency [--documents 2] [--pages 150]
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+from typing import Dict, List
+
+# No provider is called, so keep sessions in memory and skip API keys
+os.environ["STORAGE_TYPE"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from backend import service
+from benchmarks.samples import make_pdf
+from utils.parse_pool import ParsePool, extract_pdf_pages
+
+# Time between probe messages, in seconds
+PROBE_INTERVAL = 0.02
+
+async def instant_reply(user_id, message, memory, context_id=None, model=None) -> str:
+    """Stand-in for the LLM call, so only parsing can delay a reply"""
+    return f"echo: {message}"
+
+async def probe(stop: asyncio.Event, chat_ms: List[float], lag_ms: List[float]) -> None:
+    """Send a chat message every PROBE_INTERVAL until stopped, recording latency and loop lag"""
+    number = 0
+    while not stop.is_set():
+        expected = time.perf_counter() + PROBE_INTERVAL
+        await asyncio.sleep(PROBE_INTERVAL)
+        lag_ms.append(max(time.perf_counter() - expected, 0) * 1000)
+
+        # Count from when the message was due, so time spent waiting for the loop is included
+        await service.chat("bench-user", f"message {number}")
+        chat_ms.append((time.perf_counter() - expected) * 1000)
+        number += 1
+
+async def run(mode: str, documents: List[bytes], pool: ParsePool) -> Dict[str, float]:
+    """Parse the documents in the given mode while probing /chat"""
+    async def parse(content: bytes) -> None:
+        if mode == "pool":
+            await pool.run(extract_pdf_pages, content, 10000, 10 ** 9)
+        else:
+            # The original upload path: pypdf runs on the event loop thread
+            extract_pdf_pages(content, 10000, 10 ** 9)
+
+    stop = asyncio.Event()
+    chat_ms: List[float] = []
+    lag_ms: List[float] = []
+    probe_task = asyncio.create_task(probe(stop, chat_ms, lag_ms))
+    await asyncio.sleep(0.1)
+
+    start = time.perf_counter()
+    # Inline parses still run one after another, each blocking the loop until done
+    await asyncio.gather(*(parse(content) for content in documents))
+    parse_seconds = time.perf_counter() - start
+
+    stop.set()
+    await probe_task
+    chat_ms.sort()
+    return {
+        "parse_s": parse_seconds,
+        "messages": len(chat_ms),
+        "chat_median_ms": statistics.median(chat_ms),
+        "chat_max_ms": chat_ms[-1],
+        "lag_max_ms": max(lag_ms)
+    }
+
+async def main_async(document_count: int, pages: int) -> None:
+    service.get_llm_response = instant_reply
+    service.init_services()
+    documents = [make_pdf(pages, seed=seed) for seed in range(document_count)]
+
+    pool = ParsePool(max_workers=document_count, max_pending=document_count * 2, timeout=600)
+    try:
+        # Start the worker processes, so process startup isn't timed
+        await asyncio.gather(*(pool.run(time.sleep, 0.01) for _ in range(pool.max_workers)))
+        for mode in ("inline", "pool"):
+            result = await run(mode, documents, pool)
+            print(
+                f"{mode:<7} parse {result['parse_s']:>6.2f} s   {result['messages']:>4} /chat messages   "
+                f"median {result['chat_median_ms']:>8.2f} ms   max {result['chat_max_ms']:>8.2f} ms   "
+                f"max loop lag {result['lag_max_ms']:>8.2f} ms"
+            )
+    finally:
+        pool.shutdown()
+        await service.shutdown_services()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=2, help="PDFs parsed concurrently")
+    parser.add_argument("--pages", type=int, default=150, help="Pages per PDF")
+    args = parser.parse_args()
+    asyncio.run(main_async(args.documents, args.pages))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Synthetic upload files for the benchmarks, built in memory so no sample data is shipped"""
+import io
+import random
+from typing import Tuple
+
+def make_pdf(pages: int, lines_per_page: int = 60, seed: int = 0) -> bytes:
+    """Build a text PDF with the given number of pages of random words"""
+    from pypdf import PdfWriter
+    from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(2000)]
+    writer = PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    }))
+    for number in range(1, pages + 1):
+        page = writer.add_blank_page(width=612, height=792)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+        lines = [f"Page {number}"] + [" ".join(rng.choices(words, k=14)) for _ in range(lines_per_page)]
+        stream = DecodedStreamObject()
+        stream.set_data(("BT /F1 9 Tf 11 TL 40 770 Td " + " ".join(f"({line}) '" for line in lines) + " ET").encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(stream)
+
+    buffered = io.BytesIO()
+    writer.write(buffered)
+    return buffered.getvalue()
+
+def make_docx(paragraphs: int, seed: int = 0) -> bytes:
+    """Build a DOCX with the given number of paragraphs of random words"""
+    import docx
+
+    rng = random.Random(seed)
+    words = [f"term{i}" for i in range(2000)]
+    document = docx.Document()
+    for _ in range(paragraphs):
+        document.add_paragraph(" ".join(rng.choices(words, k=60)))
+    buffered = io.BytesIO()
+    document.save(buffered)
+    return buffered.getvalue()
+
+def make_photo(size: Tuple[int, int] = (4000, 3000), orientation: int = 1, seed: int = 0) -> bytes:
+    """Build a noisy JPEG photo, optionally tagged with an EXIF orientation"""
+    from PIL import Image
+
+    # Noise upscaled from a small image compresses like a photo, not like a flat graphic
+    rng = random.Random(seed)
+    small = Image.frombytes("RGB", (size[0] // 16, size[1] // 16), bytes(rng.getrandbits(8) for _ in range(size[0] // 16 * size[1] // 16 * 3)))
+    image = small.resize(size, Image.BICUBIC)
+    exif = Image.Exif()
+    if orientation != 1:
+        # 0x0112 is the EXIF orientation tag
+        exif[0x0112] = orientation
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG", quality=92, exif=exif.tobytes())
+    return buffered.getvalue()
+
+def make_screenshot(size: Tuple[int, int] = (2880, 1800)) -> bytes:
+    """Build a PNG screenshot: flat colors, window bars and text-like lines"""
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", size, (246, 246, 246))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([0, 0, size[0], 60], fill=(40, 44, 52))
+    draw.rectangle([0, 60, 420, size[1]], fill=(230, 232, 236))
+    for row in range(90, size[1] - 40, 28):
+        draw.line([(460, row), (460 + (row * 37) % (size[0] - 600), row)], fill=(60, 60, 60), width=10)
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
+
+def make_transparent_png(size: Tuple[int, int] = (1600, 1600)) -> bytes:
+    """Build an RGBA PNG with a soft-edged shape on a transparent background"""
+    from PIL import Image, ImageDraw, ImageFilter
+
+    image = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse([size[0] // 8, size[1] // 8, size[0] * 7 // 8, size[1] * 7 // 8], fill=(220, 80, 40, 255))
+    image = image.filter(ImageFilter.GaussianBlur(12))
+    buffered = io.BytesIO()
+    image.save(buffered, format="PNG")
+    return buffered.getvalue()
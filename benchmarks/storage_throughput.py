@@ -0,0 +1,119 @@
+"""Session storage throughput under concurrent users
+
+Runs a mixed read/write session workload against SQLite storage at several
+concurrency levels and reports session operations per second and how many
+operations failed with "database is locked". Compares the pooled WAL-mode
+SQLiteStorage with the original open-a-connection-per-call implementation.
+
+Usage:
+    python -m benchmarks.storage_throughput [--operations 3000] [--write-ratio 0.5] [--users 1,10,100]
+"""
+import os
+import json
+import time
+import random
+import asyncio
+import sqlite3
+import argparse
+import tempfile
+from typing import Any, Dict, List, Optional
+from backend.storage import StorageBackend, ThreadedStorage, AsyncStorageBackend
+from backend.db_storage import AsyncSQLiteStorage
+
+# History length kept per session, as in the session manager
+MAX_MESSAGES = 20
+
+class ConnectPerCallStorage(StorageBackend):
+    """The original SQLite backend: a new connection, default journal mode, per call"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE IF NOT EXISTS sessions (session_key TEXT PRIMARY KEY, data TEXT NOT NULL, last_activity REAL NOT NULL)")
+        conn.commit()
+        conn.close()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute("SELECT data FROM sessions WHERE session_key = ?", (key,)).fetchone()
+        conn.close()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, data: Dict[str, Any]) -> None:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_key, data, last_activity) VALUES (?, ?, ?)",
+            (key, json.dumps(data), data.get("last_activity", 0))
+        )
+        conn.commit()
+        conn.close()
+
+    def delete(self, key: str) -> None:
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("DELETE FROM sessions WHERE session_key = ?", (key,))
+        conn.commit()
+        conn.close()
+
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("SELECT session_key, data FROM sessions").fetchall()
+        conn.close()
+        return {key: json.loads(data) for key, data in rows}
+
+async def run_users(storage: AsyncStorageBackend, users: int, operations: int, write_ratio: float) -> Dict[str, Any]:
+    """Run the workload with the given number of concurrent users
+
+    Each user works on their own session; an operation is either a history read
+    or a chat turn append, chosen at random with the given write ratio.
+
+    Returns:
+        Operations per second, total operations, and failure counts
+    """
+    per_user = max(operations // users, 1)
+    errors: Dict[str, int] = {"locked": 0, "other": 0}
+
+    async def user(number: int) -> None:
+        rng = random.Random(number)
+        key = f"bench-user-{number}"
+        for turn in range(per_user):
+            try:
+                if rng.random() < write_ratio:
+                    messages = [{"role": "user", "content": f"question {turn}"}, {"role": "assistant", "content": f"answer {turn} " * 20}]
+                    await storage.append_messages(key, messages, MAX_MESSAGES, time.time())
+                else:
+                    await storage.get(key)
+            except sqlite3.OperationalError as e:
+                errors["locked" if "locked" in str(e) else "other"] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(number) for number in range(users)))
+    elapsed = time.perf_counter() - start
+    total = per_user * users
+    return {"ops_per_sec": total / elapsed, "operations": total, **errors}
+
+async def benchmark(name: str, make_storage, user_counts: List[int], operations: int, write_ratio: float) -> None:
+    for users in user_counts:
+        with tempfile.TemporaryDirectory() as root:
+            storage = make_storage(os.path.join(root, "sessions.db"))
+            try:
+                result = await run_users(storage, users, operations, write_ratio)
+            finally:
+                await storage.close()
+        print(
+            f"{name:<18} users={users:<4} {result['ops_per_sec']:>9.0f} ops/s  "
+            f"({result['operations']} ops, {result['locked']} locked, {result['other']} other errors)"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=3000, help="Operations per run, split across users")
+    parser.add_argument("--write-ratio", type=float, default=0.5, help="Share of operations that append a chat turn")
+    parser.add_argument("--users", default="1,10,100", help="Comma-separated concurrent user counts")
+    args = parser.parse_args()
+    user_counts = [int(users) for users in args.users.split(",")]
+
+    asyncio.run(benchmark("connect-per-call", lambda path: ThreadedStorage(ConnectPerCallStorage(path)), user_counts, args.operations, args.write_ratio))
+    asyncio.run(benchmark("pooled-wal", lambda path: AsyncSQLiteStorage(path), user_counts, args.operations, args.write_ratio))
+
+if __name__ == "__main__":
+    main()
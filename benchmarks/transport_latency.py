@@ -0,0 +1,100 @@
+"""Per-message latency of the bot's backend transports
+
+Sends /chat messages through the bot's call_api helper over each transport:
+HTTP on loopback TCP, HTTP on a Unix domain socket, and the in-process
+transport that calls the service layer directly. The backend runs on the
+same event loop with in-memory sessions, and the LLM call is replaced by an
+instant reply, so the numbers are the transport overhead alone.
+
+Usage:
+    python -m benchmarks.transport_latency [--messages 500] [--port 8765]
+"""
+import os
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+from typing import Dict, List
+
+# No provider is called, so keep sessions in memory and skip API keys
+os.environ["STORAGE_TYPE"] = "memory"
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+import uvicorn
+from backend import service
+from backend.main import app
+from bot import commands
+
+async def instant_reply(user_id, message, memory, context_id=None, model=None) -> str:
+    """Stand-in for the LLM call, so only the transport is measured"""
+    return f"echo: {message}"
+
+async def measure(transport: str, messages: int) -> List[float]:
+    """Send messages one at a time, returning each round trip in milliseconds"""
+    commands.BOT_TRANSPORT = transport
+    latencies = []
+    for number in range(messages + 10):
+        start = time.perf_counter()
+        result = await commands.call_api("/chat", {"user_id": f"bench-{transport}", "message": f"message {number}"})
+        elapsed = (time.perf_counter() - start) * 1000
+        assert result["response"] == f"echo: message {number}", result
+        # The first messages warm up connections and sessions
+        if number >= 10:
+            latencies.append(elapsed)
+    return latencies
+
+async def serve(config: uvicorn.Config) -> uvicorn.Server:
+    server = uvicorn.Server(config)
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
+
+async def run(messages: int, port: int) -> Dict[str, List[float]]:
+    service.get_llm_response = instant_reply
+    service.init_services()
+    results = {}
+
+    with tempfile.TemporaryDirectory() as root:
+        socket_path = os.path.join(root, "api.sock")
+        servers = [
+            await serve(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", lifespan="off")),
+            await serve(uvicorn.Config(app, uds=socket_path, log_level="warning", lifespan="off"))
+        ]
+        try:
+            commands.API_URL = f"http://127.0.0.1:{port}"
+            results["http (tcp)"] = await measure("remote", messages)
+            await commands.close_api_session()
+
+            # The socket path is a placeholder host once the connector targets the socket
+            commands.API_SOCKET_PATH = socket_path
+            commands.API_URL = "http://localhost"
+            results["http (unix socket)"] = await measure("remote", messages)
+            await commands.close_api_session()
+
+            results["in-process"] = await measure("inprocess", messages)
+        finally:
+            for server in servers:
+                server.should_exit = True
+            await asyncio.sleep(0.2)
+            await service.shutdown_services()
+    return results
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500, help="Messages sent per transport")
+    parser.add_argument("--port", type=int, default=8765, help="Loopback port for the HTTP backend")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.messages, args.port))
+    baseline = statistics.median(results["http (tcp)"])
+    for name, latencies in results.items():
+        latencies.sort()
+        median = statistics.median(latencies)
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:<20} median {median:>7.3f} ms   p99 {p99:>7.3f} ms   saved vs tcp {baseline - median:>7.3f} ms/message")
+
+if __name__ == "__main__":
+    main()
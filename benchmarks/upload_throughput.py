@@ -0,0 +1,109 @@
+"""Wall time of multi-attachment uploads
+
+Times a message with 1, 5 and 10 attachments from download to answer: the
+attachments are read with read_attachments and sent in one
+service.upload_files call, which parses them concurrently and asks the
+question once. For comparison, the same files are also handled one after
+another, each downloaded and uploaded on its own with the question. This is
+how a message's attachments used to be handled. Attachment downloads and the
+LLM call are stubbed with fixed delays.
+
+Usage:
+    python -m benchmarks.upload_throughput [--download-ms 100] [--llm-ms 300] [--pages 20]
+"""
+import os
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+
+# Keep sessions in memory, and parse results, indexes and blobs out of the real stores.
+# Parse workers re-import this module, so they find the directory in the environment
+if "UPLOAD_BENCHMARK_DIR" not in os.environ:
+    os.environ["UPLOAD_BENCHMARK_DIR"] = tempfile.mkdtemp(prefix="upload-benchmark-")
+_root = os.environ["UPLOAD_BENCHMARK_DIR"]
+os.environ["STORAGE_TYPE"] = "memory"
+os.environ["PARSE_CACHE_DIR"] = os.path.join(_root, "parse_cache")
+os.environ["RETRIEVAL_INDEX_DIR"] = os.path.join(_root, "retrieval_index")
+os.environ["BLOB_STORE_DIR"] = os.path.join(_root, "blobs")
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from backend import service
+from benchmarks.samples import make_docx, make_pdf
+from bot.handlers import read_attachments
+
+class FakeAttachment:
+    """A Discord attachment whose download takes a fixed time"""
+
+    def __init__(self, filename: str, content: bytes, delay: float):
+        self.filename = filename
+        self.content = content
+        self.delay = delay
+
+    async def read(self) -> bytes:
+        await asyncio.sleep(self.delay)
+        return self.content
+
+def make_attachments(count: int, pages: int, delay: float, seed: int):
+    """Alternate PDFs and DOCX files; fresh seeds keep every run out of the parse cache"""
+    attachments = []
+    for number in range(count):
+        if number % 2 == 0:
+            attachments.append(FakeAttachment(f"report{number}.pdf", make_pdf(pages, seed=seed + number), delay))
+        else:
+            attachments.append(FakeAttachment(f"notes{number}.docx", make_docx(pages * 10, seed=seed + number), delay))
+    return attachments
+
+async def batched(user_id: str, attachments) -> float:
+    start = time.perf_counter()
+    files = await read_attachments(attachments)
+    await service.upload_files(user_id, files["files"], "Summarize these files")
+    return time.perf_counter() - start
+
+async def one_by_one(user_id: str, attachments) -> float:
+    start = time.perf_counter()
+    for attachment in attachments:
+        content = await attachment.read()
+        await service.upload_files(user_id, [(attachment.filename, content)], "Summarize this file")
+    return time.perf_counter() - start
+
+async def main_async(download_ms: float, llm_ms: float, pages: int) -> None:
+    async def slow_reply(user_id, message, memory, context_id=None, model=None) -> str:
+        await asyncio.sleep(llm_ms / 1000)
+        return "summary"
+
+    service.get_llm_response = slow_reply
+    service.init_services()
+    try:
+        # Start the parse worker processes, so process startup isn't timed
+        await batched("warmup", make_attachments(2, 1, 0, seed=10000))
+
+        seed = 0
+        for count in (1, 5, 10):
+            timings = {}
+            for name, handle in (("one by one", one_by_one), ("batched", batched)):
+                attachments = make_attachments(count, pages, download_ms / 1000, seed)
+                seed += count
+                timings[name] = await handle(f"bench-{name}-{count}", attachments)
+            print(
+                f"{count:>2} attachments   one by one {timings['one by one']:>6.2f} s   "
+                f"batched {timings['batched']:>6.2f} s   ({timings['one by one'] / timings['batched']:.1f}x)"
+            )
+    finally:
+        await service.shutdown_services()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--download-ms", type=float, default=100, help="Simulated download time per attachment")
+    parser.add_argument("--llm-ms", type=float, default=300, help="Simulated LLM response time")
+    parser.add_argument("--pages", type=int, default=20, help="Pages per PDF; DOCX files get ten paragraphs per page")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args.download_ms, args.llm_ms, args.pages))
+    finally:
+        shutil.rmtree(_root, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
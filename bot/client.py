@@ -2,7 +2,7 @@ import os
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
-from bot.commands import setup_commands
+from bot.commands import setup_commands, create_api_session, close_api_session
 from bot.handlers import EventHandler
 
 # Load environment variables
@@ -33,7 +33,12 @@ async def on_message(message):
 
 async def main():
     async with bot:
-        await bot.start(os.getenv("DISCORD_BOT_TOKEN"))
+        # Open the shared backend session for the lifetime of the bot
+        await create_api_session()
+        try:
+            await bot.start(os.getenv("DISCORD_BOT_TOKEN"))
+        finally:
+            await close_api_session()
 
 def run_bot():
     import asyncio
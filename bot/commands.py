@@ -1,34 +1,127 @@
 import discord
 import aiohttp
+import codecs
 import os
+from typing import Optional
 from discord import app_commands
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# How the bot reaches the backend: "remote" calls the HTTP API, "inprocess" calls
+# the backend service layer directly when both run in the same process
+BOT_TRANSPORT = os.getenv("BOT_TRANSPORT", "remote").lower()
+
 # Backend API URL
-API_URL = "http://localhost:8000"
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+
+# Optional Unix domain socket for the backend, which skips the TCP loopback stack
+API_SOCKET_PATH = os.getenv("API_SOCKET_PATH")
+
+# Connection pool size for the shared backend session
+API_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "32"))
+
+# Per-endpoint request timeouts in seconds
+ENDPOINT_TIMEOUTS = {
+    "/chat": aiohttp.ClientTimeout(total=120),
+    "/chat/stream": aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=120),
+    "/upload": aiohttp.ClientTimeout(total=300),
+    "/set_model": aiohttp.ClientTimeout(total=15)
+}
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=120)
+
+# Bot-wide session shared by the event handler and every slash command
+_session: Optional[aiohttp.ClientSession] = None
+
+async def create_api_session() -> aiohttp.ClientSession:
+    """Create the shared backend session with a keep-alive connection pool"""
+    global _session
+    if _session is None or _session.closed:
+        if API_SOCKET_PATH:
+            connector = aiohttp.UnixConnector(path=API_SOCKET_PATH, limit=API_POOL_SIZE)
+        else:
+            connector = aiohttp.TCPConnector(limit=API_POOL_SIZE, keepalive_timeout=60)
+        _session = aiohttp.ClientSession(connector=connector)
+    return _session
+
+async def close_api_session() -> None:
+    """Close the shared backend session"""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+
+async def _call_in_process(endpoint, json_data, files=None):
+    """Call the backend service layer directly, returning the same payload as the HTTP API"""
+    # Import lazily so remote-transport bots don't load the backend
+    from backend import service
+    service.init_services()
+
+    user_id = str(json_data["user_id"])
+    context_id = json_data.get("context_id")
+    try:
+        if endpoint == "/chat":
+            response = await service.chat(user_id, json_data["message"], context_id)
+        elif endpoint == "/upload":
+            uploads = [files["file"]] if "file" in files else files["files"]
+            response = await service.upload_files(user_id, uploads, json_data.get("question"), context_id, json_data.get("pages"))
+        elif endpoint == "/set_model":
+            response = await service.set_model(user_id, json_data["model"], context_id)
+        else:
+            raise ValueError(f"Unknown endpoint: {endpoint}")
+    except Exception as e:
+        return {"detail": str(e)}
+    return {"response": response}
 
 async def call_api(endpoint, json_data, files=None):
     """Helper function to call the backend API"""
-    async with aiohttp.ClientSession() as session:
-        if files:
-            # Handle file uploads
-            form_data = aiohttp.FormData()
-            for key, value in json_data.items():
-                form_data.add_field(key, str(value))
-            
-            for file_key, file_tuple in files.items():
-                filename, content = file_tuple
+    if BOT_TRANSPORT == "inprocess":
+        return await _call_in_process(endpoint, json_data, files)
+
+    session = await create_api_session()
+    timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    if files:
+        # Handle file uploads
+        form_data = aiohttp.FormData()
+        for key, value in json_data.items():
+            form_data.add_field(key, str(value))
+
+        # A field holds one (filename, content) tuple, or a list of them for a repeated field
+        for file_key, file_tuples in files.items():
+            for filename, content in file_tuples if isinstance(file_tuples, list) else [file_tuples]:
                 form_data.add_field(file_key, content, filename=filename)
-            
-            async with session.post(f"{API_URL}{endpoint}", data=form_data) as response:
-                return await response.json()
-        else:
-            # Regular JSON request
-            async with session.post(f"{API_URL}{endpoint}", json=json_data) as response:
-                return await response.json()
+
+        async with session.post(f"{API_URL}{endpoint}", data=form_data, timeout=timeout) as response:
+            return await response.json()
+    else:
+        # Regular JSON request
+        async with session.post(f"{API_URL}{endpoint}", json=json_data, timeout=timeout) as response:
+            return await response.json()
+
+async def call_api_stream(endpoint, json_data):
+    """Helper function to call a streaming backend endpoint, yielding text chunks as they arrive"""
+    if BOT_TRANSPORT == "inprocess":
+        from backend import service
+        service.init_services()
+        token_stream = await service.chat_stream(str(json_data["user_id"]), json_data["message"], json_data.get("context_id"))
+        async for token in token_stream:
+            yield token
+        return
+
+    session = await create_api_session()
+    timeout = ENDPOINT_TIMEOUTS.get(endpoint, DEFAULT_TIMEOUT)
+    async with session.post(f"{API_URL}{endpoint}", json=json_data, timeout=timeout) as response:
+        response.raise_for_status()
+        # Decode incrementally so multi-byte characters split across chunks stay intact
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        async for chunk in response.content.iter_any():
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
 
 async def setup_commands(bot):
     """Set up slash commands for the Discord bot"""
@@ -1,14 +1,86 @@
 # This file will handle Discord events and route them to the backend
 # Handles both slash commands and direct messages
 
+import time
+import asyncio
 from discord import DMChannel, Thread, TextChannel
 import discord
-from bot.commands import call_api
+from bot.commands import call_api, call_api_stream
 from utils.logger import get_logger
 
 # Set up logger
 logger = get_logger("event_handler")
 
+# Discord's maximum message length
+DISCORD_MESSAGE_LIMIT = 2000
+
+# Minimum seconds between edits of a streamed message, to stay under Discord's rate limits
+STREAM_EDIT_INTERVAL = 1.0
+
+async def send_streamed_response(channel, chunks):
+    """Send a streamed response by editing one Discord message in place
+
+    Text is accumulated into the current message, which is edited at most once per
+    STREAM_EDIT_INTERVAL. When it reaches the 2000 character limit, it is finalized
+    and the remaining text continues in a new message.
+
+    Args:
+        channel: The channel to send the response to
+        chunks: An async iterator of response text chunks
+    """
+    current_message = None
+    current_text = ""
+    sent_text = ""
+    last_edit = 0.0
+    message_count = 0
+
+    async def flush():
+        nonlocal current_message, sent_text, last_edit, message_count
+        if not current_text or current_text == sent_text:
+            return
+        if current_message is None:
+            current_message = await channel.send(current_text)
+            message_count += 1
+        else:
+            await current_message.edit(content=current_text)
+        sent_text = current_text
+        last_edit = time.monotonic()
+
+    async for chunk in chunks:
+        while chunk:
+            space = DISCORD_MESSAGE_LIMIT - len(current_text)
+            current_text += chunk[:space]
+            chunk = chunk[space:]
+
+            if chunk:
+                # Current message is full, finalize it and roll over to a new one
+                await flush()
+                current_message = None
+                current_text = ""
+                sent_text = ""
+
+        if time.monotonic() - last_edit >= STREAM_EDIT_INTERVAL:
+            await flush()
+
+    await flush()
+
+    if message_count == 0:
+        await channel.send("No response from API.")
+    elif message_count > 1:
+        logger.info(f"Streamed response across {message_count} messages")
+
+async def read_attachments(attachments):
+    """Download a message's attachments concurrently
+
+    Args:
+        attachments: The message's Discord attachments
+
+    Returns:
+        A files mapping for call_api with every attachment in the "files" field
+    """
+    contents = await asyncio.gather(*(attachment.read() for attachment in attachments))
+    return {"files": [(attachment.filename, content) for attachment, content in zip(attachments, contents)]}
+
 class EventHandler:
     """Handles Discord events and routes them to the backend"""
     
@@ -28,10 +100,8 @@ class EventHandler:
                 try:
                     if message.attachments:
                         # Process file uploads
-                        logger.info(f"Processing attachment: {message.attachments[0].filename}")
-                        attachment = message.attachments[0]
-                        content = await attachment.read()
-                        files = {"file": (attachment.filename, content)}
+                        logger.info(f"Processing {len(message.attachments)} attachment(s): {', '.join(a.filename for a in message.attachments)}")
+                        files = await read_attachments(message.attachments)
                         payload = {"user_id": str(message.author.id)}
                         if message.content:
                             payload["question"] = message.content
@@ -39,10 +109,11 @@ class EventHandler:
                     else:
                         # Process text message
                         payload = {"user_id": str(message.author.id), "message": message.content}
-                        response = await call_api("/chat", payload)
+                        await send_streamed_response(message.channel, call_api_stream("/chat/stream", payload))
+                        return
                     
                     # Get the response text
-                    response_text = response.get("response", "No response from API.")
+                    response_text = response.get("response", response.get("detail", "No response from API."))
                     
                     # Split long messages to comply with Discord's 2000 character limit
                     if len(response_text) <= 2000:
@@ -79,10 +150,8 @@ class EventHandler:
                     
                     if message.attachments:
                         # Process file uploads in thread
-                        logger.info(f"Processing attachment in thread: {message.attachments[0].filename}")
-                        attachment = message.attachments[0]
-                        content = await attachment.read()
-                        files = {"file": (attachment.filename, content)}
+                        logger.info(f"Processing {len(message.attachments)} attachment(s) in thread: {', '.join(a.filename for a in message.attachments)}")
+                        files = await read_attachments(message.attachments)
                         payload = {"user_id": thread_user_id}
                         if message.content:
                             payload["question"] = message.content
@@ -90,10 +159,11 @@ class EventHandler:
                     else:
                         # Process text message in thread
                         payload = {"user_id": thread_user_id, "message": message.content}
-                        response = await call_api("/chat", payload)
+                        await send_streamed_response(message.channel, call_api_stream("/chat/stream", payload))
+                        return
                     
                     # Get the response text
-                    response_text = response.get("response", "No response from API.")
+                    response_text = response.get("response", response.get("detail", "No response from API."))
                     
                     # Split long messages to comply with Discord's 2000 character limit
                     if len(response_text) <= 2000:
@@ -3,7 +3,7 @@ import asyncio
 import uvicorn
 import threading
 from dotenv import load_dotenv
-from bot.client import run_bot
+from bot.client import run_bot, main as bot_main
 from utils.logger import get_logger
 
 # Load environment variables
@@ -15,13 +15,34 @@ logger = get_logger("main")
 def run_backend():
     """Run the FastAPI backend"""
     logger.info("Starting FastAPI backend...")
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, log_level="info")
+    socket_path = os.getenv("API_SOCKET_PATH")
+    if socket_path:
+        # Serve the bot over a Unix domain socket to avoid loopback TCP overhead
+        uvicorn.run("backend.main:app", uds=socket_path, log_level="info")
+    else:
+        uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, log_level="info")
 
 def run_discord_bot():
     """Run the Discord bot"""
     logger.info("Starting Discord bot...")
     run_bot()
 
+async def run_in_process():
+    """Run the bot and the FastAPI backend on one event loop
+
+    The bot calls the backend service layer directly, while the HTTP API stays
+    available for external clients.
+    """
+    logger.info("Starting Discord bot with in-process backend...")
+    config = uvicorn.Config("backend.main:app", host="0.0.0.0", port=8000, log_level="info")
+    server = uvicorn.Server(config)
+    api_task = asyncio.create_task(server.serve())
+    try:
+        await bot_main()
+    finally:
+        server.should_exit = True
+        await api_task
+
 def main():
     """Run both the Discord bot and FastAPI backend"""
     logger.info("Starting Discord LLM Bot application...")
@@ -35,6 +56,10 @@ def main():
         logger.error("Please set these variables in your .env file and try again.")
         return
     
+    if os.getenv("BOT_TRANSPORT", "remote").lower() == "inprocess":
+        asyncio.run(run_in_process())
+        return
+
     # Start the FastAPI backend in a separate thread
     backend_thread = threading.Thread(target=run_backend, daemon=True)
     backend_thread.start()
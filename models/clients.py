@@ -0,0 +1,46 @@
+import threading
+from typing import Dict, Any, Callable, Tuple
+
+class ClientRegistry:
+    """Process-wide registry of long-lived provider clients
+
+    Clients are keyed by model name and built once, then shared by all requests.
+    Each entry remembers the config it was built from, and is rebuilt only when
+    the config passed on lookup differs from it.
+    """
+
+    def __init__(self):
+        self._clients: Dict[str, Tuple[Dict[str, Any], Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, config: Dict[str, Any], factory: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Get the client for a model, building it if missing or if its config changed
+
+        Args:
+            model_name: The model name (a key of VALID_MODELS)
+            config: The settings the client should be built with
+            factory: Builds a new client from the config
+
+        Returns:
+            The shared client for the model
+        """
+        # Fast path: lock-free read of an up-to-date client
+        entry = self._clients.get(model_name)
+        if entry is not None and entry[0] == config:
+            return entry[1]
+
+        with self._lock:
+            # Another request may have built the client while we waited for the lock
+            entry = self._clients.get(model_name)
+            if entry is None or entry[0] != config:
+                entry = (dict(config), factory(config))
+                self._clients[model_name] = entry
+            return entry[1]
+
+    def clear(self) -> None:
+        """Drop all clients so they are rebuilt on next use"""
+        with self._lock:
+            self._clients.clear()
+
+# Global registry shared by all provider wrappers
+client_registry = ClientRegistry()
@@ -0,0 +1,288 @@
+import os
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+from dotenv import load_dotenv
+from utils.retrieval import document_index, RETRIEVAL_TOP_K, RETRIEVAL_FULL_TEXT_TOKENS
+
+# Load environment variables
+load_dotenv()
+
+# Use tiktoken for exact counts when it is installed and its encoding is available,
+# otherwise estimate from length
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+# Average characters per token for the length-based estimate
+CHARS_PER_TOKEN = 4
+
+# Fixed per-message overhead for role and formatting tokens
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Flat token cost of one image attachment
+IMAGE_TOKENS = 765
+
+# Marker appended to truncated document content
+TRUNCATION_MARKER = "\n[... content truncated to fit the context window ...]"
+
+# Default prompt token budget for each model in VALID_MODELS
+DEFAULT_CONTEXT_BUDGETS = {
+    "gpt-4o": 24000,
+    "gemini-2.0-flash": 32000,
+    "gemini-2.5-pro-experimental": 32000,
+    "deepseek-v3": 24000
+}
+
+def _parse_budgets(value: str) -> Dict[str, int]:
+    """Parse "model=tokens,model=tokens" overrides"""
+    budgets = {}
+    for item in value.split(","):
+        if "=" in item:
+            model, tokens = item.split("=", 1)
+            budgets[model.strip()] = int(tokens)
+    return budgets
+
+# Per-model budgets, overridable with CONTEXT_TOKEN_BUDGETS="gpt-4o=16000,deepseek-v3=12000"
+CONTEXT_BUDGETS = {**DEFAULT_CONTEXT_BUDGETS, **_parse_budgets(os.getenv("CONTEXT_TOKEN_BUDGETS", ""))}
+
+# Largest share of the budget any single uploaded document may take
+MAX_DOCUMENT_SHARE = float(os.getenv("CONTEXT_MAX_DOCUMENT_SHARE", "0.5"))
+
+@lru_cache(maxsize=8192)
+def count_text_tokens(text: str) -> int:
+    """Count the tokens in a piece of text, caching the result per string"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+def _is_document(content: Any) -> bool:
+    """Whether message content is an uploaded document stored as chunks"""
+    return isinstance(content, dict) and content.get("type") == "document"
+
+def _chunk_count(document: Dict[str, Any]) -> int:
+    # Indexed documents keep their chunks in the retrieval index, and only the count in history
+    return document.get("chunk_count", len(document.get("chunks", [])))
+
+def _document_header(document: Dict[str, Any]) -> str:
+    count, unit = (document["total_pages"], "page") if "total_pages" in document else (_chunk_count(document), "section")
+    size = f"{count} {unit}{'' if count == 1 else 's'}"
+    return f"Content from uploaded file '{document.get('filename', 'document')}' ({size}):"
+
+def _chunk_number(chunk: Dict[str, Any]) -> int:
+    return chunk["page"] if "page" in chunk else chunk["section"]
+
+def _chunk_text(chunk: Dict[str, Any]) -> str:
+    label = f"Page {chunk['page']}" if "page" in chunk else f"Section {chunk['section']}"
+    return f"[{label}]\n{chunk['text']}"
+
+def render_document(document: Dict[str, Any], chunks: Optional[List[Dict[str, Any]]] = None) -> str:
+    """Render an uploaded document, or a subset of its chunks, as prompt text
+
+    Args:
+        document: A document message's content
+        chunks: Optional subset of the document's chunks to include, defaulting to all of them
+
+    Returns:
+        The document text with a header and page or section markers
+    """
+    chunks = document.get("chunks", []) if chunks is None else chunks
+    parts = [_document_header(document)] + [_chunk_text(chunk) for chunk in chunks]
+    if len(chunks) < _chunk_count(document) or document.get("truncated"):
+        parts.append("[... other parts omitted ...]")
+    return "\n\n".join(parts)
+
+def count_document_tokens(document: Dict[str, Any], chunks: Optional[List[Dict[str, Any]]] = None) -> int:
+    """Count the tokens of a rendered document from its cached per-chunk counts"""
+    chunks = document.get("chunks", []) if chunks is None else chunks
+    tokens = count_text_tokens(_document_header(document)) + count_text_tokens(TRUNCATION_MARKER)
+    # One extra token per chunk covers the separator between chunks
+    return tokens + sum(count_text_tokens(_chunk_text(chunk)) + 1 for chunk in chunks)
+
+def count_message_tokens(message: Dict[str, Any]) -> int:
+    """Count the tokens a history message adds to the prompt"""
+    content = message["content"]
+    if isinstance(content, dict):
+        if _is_document(content):
+            return MESSAGE_OVERHEAD_TOKENS + count_document_tokens(content)
+        if content.get("type") == "image":
+            return MESSAGE_OVERHEAD_TOKENS + IMAGE_TOKENS + count_text_tokens(content.get("metadata", ""))
+        return MESSAGE_OVERHEAD_TOKENS + count_text_tokens(str(content.get("content", "")))
+    return MESSAGE_OVERHEAD_TOKENS + count_text_tokens(str(content))
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Truncate text so it fits in max_tokens, marking that it was cut"""
+    if count_text_tokens(text) <= max_tokens:
+        return text
+
+    keep = max_tokens - count_text_tokens(TRUNCATION_MARKER)
+    if keep <= 0:
+        return ""
+
+    # Estimate the cut point from the text's own chars-per-token ratio, then shrink until it fits
+    cut = int(keep * len(text) / count_text_tokens(text))
+    while cut > 0:
+        candidate = text[:cut] + TRUNCATION_MARKER
+        if count_text_tokens(candidate) <= max_tokens:
+            return candidate
+        cut = int(cut * 0.9)
+    return ""
+
+def _candidate_chunks(document: Dict[str, Any], query: str) -> List[Dict[str, Any]]:
+    """Get a document's chunks to consider for the prompt, most important first
+
+    Documents stored inline in history offer all their chunks in order.
+    Indexed documents offer the top-k chunks for the query from their
+    retrieval index, or all their chunks if the whole document is small.
+    """
+    if "doc_id" not in document:
+        return document.get("chunks", [])
+
+    index = document_index.get(document["doc_id"])
+    if index is None:
+        return []
+
+    # Stop counting as soon as the document is too large to send whole
+    tokens = 0
+    for chunk in index.chunks:
+        tokens += count_text_tokens(_chunk_text(chunk)) + 1
+        if tokens > RETRIEVAL_FULL_TEXT_TOKENS:
+            # Questions with no terms in the document fall back to its opening chunks
+            return index.search(query, RETRIEVAL_TOP_K) or index.chunks[:RETRIEVAL_TOP_K]
+    return index.chunks
+
+def _fit_document(message: Dict[str, Any], max_tokens: int, query: str = "") -> Optional[Dict[str, Any]]:
+    """Render a document message with as many whole chunks as fit in max_tokens, in document order
+
+    Args:
+        message: A document message
+        max_tokens: Token budget for the rendered message
+        query: The current question, used to pick chunks of indexed documents
+
+    Returns:
+        The rendered message, or None if no part of the document fits or its index is missing
+    """
+    document = message["content"]
+    candidates = _candidate_chunks(document, query)
+    remaining = max_tokens - MESSAGE_OVERHEAD_TOKENS - count_document_tokens(document, [])
+    if not candidates or remaining <= 0:
+        # Nothing of the document can be shown, so don't send its header either
+        return None
+
+    chunks = []
+    for chunk in candidates:
+        tokens = count_text_tokens(_chunk_text(chunk)) + 1
+        if tokens > remaining:
+            break
+        chunks.append(chunk)
+        remaining -= tokens
+
+    if not chunks and candidates:
+        # Not even the first chunk fits whole, so cut it short
+        first = candidates[0]
+        text = truncate_text(first["text"], remaining - count_text_tokens(_chunk_text({**first, "text": ""})) - 1)
+        if not text:
+            return None
+        chunks = [{**first, "text": text}]
+
+    return {**message, "content": render_document(document, sorted(chunks, key=_chunk_number))}
+
+def _fit_message(message: Dict[str, Any], max_tokens: int, query: str = "") -> Optional[Dict[str, Any]]:
+    """Return the message, with text content truncated if needed, or None if it cannot fit
+
+    Document messages are always rendered to text, keeping whole chunks where possible.
+    """
+    if _is_document(message["content"]):
+        return _fit_document(message, max_tokens, query)
+    if count_message_tokens(message) <= max_tokens:
+        return message
+    if not isinstance(message["content"], str):
+        return None
+
+    content = truncate_text(message["content"], max_tokens - MESSAGE_OVERHEAD_TOKENS)
+    if not content:
+        return None
+    return {**message, "content": content}
+
+def get_context_budget(model: str) -> int:
+    """Get the prompt token budget for a model"""
+    return CONTEXT_BUDGETS.get(model, min(DEFAULT_CONTEXT_BUDGETS.values()))
+
+def build_context(memory: List[Dict[str, Any]], model: str, budget: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Assemble the history sent to a model so it fits the model's token budget
+
+    The latest message is always kept, truncated if it alone exceeds the budget.
+    Uploaded documents (system messages) are capped at a share of the budget and
+    kept newest first; chunked documents are rendered to text keeping whole chunks,
+    and indexed documents send only the chunks most relevant to the latest message.
+    Then conversation turns are added newest first until the budget runs out, so
+    the oldest turns are dropped first. Message order is preserved.
+
+    Args:
+        memory: The session's chat history, ending with the current message
+        model: The model the prompt is for
+        budget: Optional token budget overriding the model's configured budget
+
+    Returns:
+        The subset of the history to send, in order, within the budget
+    """
+    if not memory:
+        return []
+
+    budget = get_context_budget(model) if budget is None else budget
+    document_cap = int(budget * MAX_DOCUMENT_SHARE)
+    last_index = len(memory) - 1
+
+    selected: Dict[int, Dict[str, Any]] = {}
+    remaining = budget
+
+    # The latest message is always part of the prompt
+    latest = _fit_message(memory[last_index], remaining)
+    if latest is None:
+        return []
+    selected[last_index] = latest
+    remaining -= count_message_tokens(latest)
+    query = latest["content"] if isinstance(latest["content"], str) else ""
+
+    # Uploaded documents and images next, newest first, each capped at the document share
+    for index in range(last_index - 1, -1, -1):
+        message = memory[index]
+        if message["role"] != "system":
+            continue
+        fitted = _fit_message(message, min(document_cap, remaining), query)
+        if fitted is not None:
+            selected[index] = fitted
+            remaining -= count_message_tokens(fitted)
+
+    # Then conversation turns, newest first, stopping at the first turn that doesn't fit
+    for index in range(last_index - 1, -1, -1):
+        message = memory[index]
+        if message["role"] == "system":
+            continue
+        tokens = count_message_tokens(message)
+        if tokens > remaining:
+            break
+        selected[index] = message
+        remaining -= tokens
+
+    return [selected[index] for index in sorted(selected)]
+
+def prepare_prompt(message: str, memory: List[Dict[str, Any]], model: str) -> Tuple[str, List[Dict[str, Any]]]:
+    """Fit the history and current message into the model's budget
+
+    Args:
+        message: The current user message
+        memory: The session's chat history, which may already end with the message
+        model: The model the prompt is for
+
+    Returns:
+        A (message, history) tuple where the history ends with the possibly truncated message
+    """
+    if not memory or memory[-1]["role"] != "user" or memory[-1]["content"] != message:
+        memory = memory + [{"role": "user", "content": message}]
+
+    context = build_context(memory, model)
+    if not context:
+        return message, memory[-1:]
+    return context[-1]["content"], context
@@ -1,6 +1,8 @@
 import os
-from typing import Dict, List, Any
-import requests
+import json
+import asyncio
+from typing import Dict, List, Any, Optional, AsyncIterator
+import aiohttp
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,45 +12,116 @@ load_dotenv()
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY")
 DEEPSEEK_API_URL = "https://api.deepseek.com/v1/chat/completions"
 
+# HTTP client configuration
+DEEPSEEK_CONNECT_TIMEOUT = float(os.getenv("DEEPSEEK_CONNECT_TIMEOUT", "10"))
+DEEPSEEK_READ_TIMEOUT = float(os.getenv("DEEPSEEK_READ_TIMEOUT", "120"))
+DEEPSEEK_MAX_CONCURRENCY = int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "16"))
+DEEPSEEK_KEEPALIVE_TIMEOUT = float(os.getenv("DEEPSEEK_KEEPALIVE_TIMEOUT", "60"))
+
+# Shared HTTP session and concurrency limiter, created lazily on the running event loop
+_session: Optional[aiohttp.ClientSession] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+
+def _get_session() -> aiohttp.ClientSession:
+    """Get the process-wide DeepSeek HTTP session, creating it on first use"""
+    global _session, _semaphore
+    if _session is None or _session.closed:
+        connector = aiohttp.TCPConnector(
+            limit=DEEPSEEK_MAX_CONCURRENCY,
+            keepalive_timeout=DEEPSEEK_KEEPALIVE_TIMEOUT
+        )
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=DEEPSEEK_CONNECT_TIMEOUT,
+            sock_read=DEEPSEEK_READ_TIMEOUT
+        )
+        _session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            headers={
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
+            }
+        )
+        _semaphore = asyncio.Semaphore(DEEPSEEK_MAX_CONCURRENCY)
+    return _session
+
+async def close_deepseek_session() -> None:
+    """Close the shared DeepSeek HTTP session"""
+    global _session, _semaphore
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _semaphore = None
+
+def _build_payload(message: str, memory: List[Dict[str, str]], stream: bool = False) -> Dict[str, Any]:
+    """Convert memory format to a DeepSeek chat completion payload"""
+    messages = []
+    for msg in memory:
+        if msg["role"] in ["user", "assistant", "system"]:
+            content = msg["content"]
+            # DeepSeek is text-only, so image attachments are described by their metadata
+            if isinstance(content, dict) and content.get("type") == "image":
+                content = content["metadata"]
+            messages.append({
+                "role": msg["role"],
+                "content": content
+            })
+
+    # Add the current message if it's not already in memory
+    if not memory or memory[-1]["role"] != "user" or memory[-1]["content"] != message:
+        messages.append({"role": "user", "content": message})
+
+    return {
+        "model": "deepseek-chat",
+        "messages": messages,
+        "temperature": 0.7,
+        "max_tokens": 1000,
+        "stream": stream
+    }
+
 async def call_deepseek(message: str, memory: List[Dict[str, str]]) -> str:
     """Call the DeepSeek model"""
     try:
-        # Prepare headers with API key
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {DEEPSEEK_API_KEY}"
-        }
-        
-        # Convert memory format to DeepSeek chat format
-        messages = []
-        for msg in memory:
-            if msg["role"] in ["user", "assistant", "system"]:
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
-        
-        # Add the current message if it's not already in memory
-        if not memory or memory[-1]["role"] != "user" or memory[-1]["content"] != message:
-            messages.append({"role": "user", "content": message})
-        
         # Prepare request payload
-        payload = {
-            "model": "deepseek-chat",
-            "messages": messages,
-            "temperature": 0.7,
-            "max_tokens": 1000
-        }
-        
-        # Make API request
-        response = requests.post(DEEPSEEK_API_URL, headers=headers, json=payload)
-        response.raise_for_status()
-        
-        # Parse response
-        result = response.json()
-        
+        payload = _build_payload(message, memory)
+
+        # Make API request on the shared session, bounded by the concurrency limit
+        session = _get_session()
+        async with _semaphore:
+            async with session.post(DEEPSEEK_API_URL, json=payload) as response:
+                response.raise_for_status()
+
+                # Parse response
+                result = await response.json()
+
         # Return the response content
         return result["choices"][0]["message"]["content"]
     except Exception as e:
         print(f"Error calling DeepSeek: {str(e)}")
-        return f"I'm sorry, I encountered an error while processing your request with DeepSeek V3. Please try again later."
\ No newline at end of file
+        return f"I'm sorry, I encountered an error while processing your request with DeepSeek V3. Please try again later."
+
+async def stream_deepseek(message: str, memory: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Stream the DeepSeek model response token by token"""
+    try:
+        payload = _build_payload(message, memory, stream=True)
+
+        session = _get_session()
+        async with _semaphore:
+            async with session.post(DEEPSEEK_API_URL, json=payload) as response:
+                response.raise_for_status()
+
+                # The API streams server-sent events, one JSON delta per "data:" line
+                async for line in response.content:
+                    line = line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {})
+                    if delta.get("content"):
+                        yield delta["content"]
+    except Exception as e:
+        print(f"Error streaming DeepSeek: {str(e)}")
+        # Re-raise so the router can tell a failed stream from a complete one
+        raise
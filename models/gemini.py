@@ -1,9 +1,12 @@
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, AsyncIterator
 import google.generativeai as genai
 from dotenv import load_dotenv
 from langchain_community.llms import GooglePalm
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from models.clients import client_registry
+from utils.thread_pool import run_blocking
+from utils.image_pipeline import image_part_cache
 
 # Load environment variables
 load_dotenv()
@@ -11,56 +14,95 @@ load_dotenv()
 # Set Google API key
 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
 
+def _build_client(config: Dict[str, Any]) -> genai.GenerativeModel:
+    """Build a Gemini model client from its settings"""
+    genai.configure(api_key=config["api_key"])
+    return genai.GenerativeModel(config["model_id"])
+
+def get_gemini_client(model: str) -> genai.GenerativeModel:
+    """Get the shared Gemini model client, rebuilding it if its settings changed"""
+    config = {
+        "model_id": model,
+        "api_key": os.getenv("GOOGLE_API_KEY")
+    }
+    return client_registry.get(model, config, _build_client)
+
+def _inline_data_part(image_b64: str, mime_type: str) -> Dict[str, Any]:
+    """Build a Gemini inline image part"""
+    return {"inline_data": {"mime_type": mime_type, "data": image_b64}}
+
+def _build_history(memory: List[Dict[str, Any]], message: str, model: str) -> List[Dict[str, Any]]:
+    """Convert memory format to Gemini chat format, excluding the current message"""
+    # The current message is sent separately, so drop it if memory already ends with it
+    if memory and memory[-1]["role"] == "user" and memory[-1]["content"] == message:
+        memory = memory[:-1]
+
+    chat_history = []
+    for msg in memory:
+        if msg["role"] == "user":
+            chat_history.append({"role": "user", "parts": [msg["content"]]})
+        elif msg["role"] == "assistant":
+            chat_history.append({"role": "model", "parts": [msg["content"]]})
+        elif msg["role"] == "system":
+            # Check if this is an image message
+            if isinstance(msg["content"], dict) and msg["content"].get("type") == "image":
+                # Create a multimodal message with image, reusing the part prepared on an earlier turn
+                image_data = msg["content"]
+                image_part = image_part_cache.get(image_data, model, _inline_data_part)
+                chat_history.append({"role": "user", "parts": [{"text": image_data["metadata"]}, image_part]})
+            else:
+                # Gemini doesn't have a system role, so we'll add it as a user message
+                chat_history.append({"role": "user", "parts": [f"System instruction: {msg['content']}"]})
+    return chat_history
+
 async def call_gemini(message: str, memory: List[Dict[str, Any]], model: str = "gemini-2.0-flash") -> str:
     """Call the Google Gemini model"""
     try:
-        # Initialize Gemini model
-        model = genai.GenerativeModel(model)
-        
-        # Convert memory format to Gemini chat format
-        chat_history = []
-        for msg in memory:
-            if msg["role"] == "user":
-                chat_history.append({"role": "user", "parts": [msg["content"]]})
-            elif msg["role"] == "assistant":
-                chat_history.append({"role": "model", "parts": [msg["content"]]})
-            elif msg["role"] == "system":
-                # Check if this is an image message
-                if isinstance(msg["content"], dict) and msg["content"].get("type") == "image":
-                    # Create a multimodal message with image
-                    image_data = msg["content"]
-                    import base64
-                    from PIL import Image
-                    import io
-                    
-                    # Decode base64 image
-                    image_bytes = base64.b64decode(image_data["base64"])
-                    image = Image.open(io.BytesIO(image_bytes))
-                    
-                    # Create parts with text and image
-                    parts = [
-                        {"text": image_data["metadata"]},
-                        {"inline_data": {
-                            "mime_type": image_data["mime_type"],
-                            "data": image_data["base64"]
-                        }}
-                    ]
-                    chat_history.append({"role": "user", "parts": parts})
-                else:
-                    # Gemini doesn't have a system role, so we'll add it as a user message
-                    chat_history.append({"role": "user", "parts": [f"System instruction: {msg['content']}"]})        
-        
+        # Get the shared Gemini model client
+        client = get_gemini_client(model)
+
+        # Build the history off the event loop, since an image's first use reads and encodes its blob
+        chat_history = await run_blocking(_build_history, memory, message, model)
+
         # Start a chat session
-        chat = model.start_chat(history=chat_history)
-        
-        # Generate response
-        response = chat.send_message(message)
-        
+        chat = client.start_chat(history=chat_history)
+
+        # Generate response without blocking the event loop
+        response = await chat.send_message_async(message)
+
         # Return the response content
         return response.text
     except Exception as e:
         print(f"Error calling Gemini: {str(e)}")
         return f"I'm sorry, I encountered an error while processing your request with Gemini. Please try again later."
+
+async def stream_gemini(message: str, memory: List[Dict[str, Any]], model: str = "gemini-2.0-flash") -> AsyncIterator[str]:
+    """Stream the Google Gemini model response chunk by chunk"""
+    try:
+        # Get the shared Gemini model client
+        client = get_gemini_client(model)
+
+        # Build the history off the event loop, since an image's first use reads and encodes its blob
+        chat_history = await run_blocking(_build_history, memory, message, model)
+
+        # Start a chat session
+        chat = client.start_chat(history=chat_history)
+
+        # Yield text chunks as they arrive from the provider
+        response = await chat.send_message_async(message, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
     except Exception as e:
-        print(f"Error calling Gemini: {str(e)}")
-        return f"I'm sorry, I encountered an error while processing your request with Gemini 1.5 Flash. Please try again later."
\ No newline at end of file
+        print(f"Error streaming Gemini: {str(e)}")
+        # Re-raise so the router can tell a failed stream from a complete one
+        raise
+
+async def generate_gemini(prompt: str, model: str = "gemini-2.0-flash") -> str:
+    """Generate a single completion from a Gemini model
+
+    Unlike call_gemini, errors are raised rather than turned into a reply, so
+    background jobs can tell a failure from a result.
+    """
+    response = await get_gemini_client(model).generate_content_async(prompt)
+    return response.text
@@ -1,9 +1,12 @@
 import os
-from typing import Dict, List, Any
+from typing import Dict, List, Any, AsyncIterator
 import openai
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+from models.clients import client_registry
+from utils.image_pipeline import image_part_cache
+from utils.thread_pool import run_blocking
 
 # Load environment variables
 load_dotenv()
@@ -11,50 +14,91 @@ load_dotenv()
 # Set OpenAI API key
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
+def _client_config() -> Dict[str, Any]:
+    """Settings the shared ChatOpenAI client is built from"""
+    return {
+        "model_name": "gpt-4o",
+        "temperature": 0.7,
+        "api_key": os.getenv("OPENAI_API_KEY")
+    }
+
+def _build_client(config: Dict[str, Any]) -> ChatOpenAI:
+    """Build a ChatOpenAI client from its settings"""
+    return ChatOpenAI(
+        model_name=config["model_name"],
+        temperature=config["temperature"],
+        openai_api_key=config["api_key"],
+        # Explicitly set proxies to None to avoid the error
+        openai_proxy=None
+    )
+
+def get_gpt_client() -> ChatOpenAI:
+    """Get the shared ChatOpenAI client, rebuilding it if its settings changed"""
+    return client_registry.get("gpt-4o", _client_config(), _build_client)
+
+def _image_url_part(image_b64: str, mime_type: str) -> Dict[str, Any]:
+    """Build an OpenAI image_url content part from a data URL"""
+    return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{image_b64}"}}
+
+def _build_messages(message: str, memory: List[Dict[str, Any]]) -> List[Any]:
+    """Convert memory format to LangChain message format"""
+    messages = []
+    for msg in memory:
+        if msg["role"] == "user":
+            messages.append(HumanMessage(content=msg["content"]))
+        elif msg["role"] == "assistant":
+            messages.append(AIMessage(content=msg["content"]))
+        elif msg["role"] == "system":
+            # Check if this is an image message
+            if isinstance(msg["content"], dict) and msg["content"].get("type") == "image":
+                # Create a multimodal message with image
+                image_data = msg["content"]
+                content = [
+                    {"type": "text", "text": image_data["metadata"]},
+                    image_part_cache.get(image_data, "gpt-4o", _image_url_part)
+                ]
+                messages.append(HumanMessage(content=content))
+            else:
+                messages.append(SystemMessage(content=msg["content"]))
+
+    # Add the current message if it's not already in memory
+    if not memory or memory[-1]["role"] != "user" or memory[-1]["content"] != message:
+        messages.append(HumanMessage(content=message))
+
+    return messages
+
 async def call_gpt(message: str, memory: List[Dict[str, Any]]) -> str:
     """Call the OpenAI GPT model using LangChain"""
     try:
-        # Initialize the ChatOpenAI model
-        chat = ChatOpenAI(
-            model_name="gpt-4o",
-            temperature=0.7,
-            streaming=False,
-            # Explicitly set proxies to None to avoid the error
-            openai_proxy=None
-        )
-        
-        # Convert memory format to LangChain message format
-        messages = []
-        for msg in memory:
-            if msg["role"] == "user":
-                messages.append(HumanMessage(content=msg["content"]))
-            elif msg["role"] == "assistant":
-                messages.append(AIMessage(content=msg["content"]))
-            elif msg["role"] == "system":
-                # Check if this is an image message
-                if isinstance(msg["content"], dict) and msg["content"].get("type") == "image":
-                    # Create a multimodal message with image
-                    image_data = msg["content"]
-                    content = [
-                        {"type": "text", "text": image_data["metadata"]},
-                        {"type": "image_url", "image_url": {"url": f"data:{image_data['mime_type']};base64,{image_data['base64']}"}}                        
-                    ]
-                    messages.append(HumanMessage(content=content))
-                else:
-                    messages.append(SystemMessage(content=msg["content"]))
-        
-        # Add the current message if it's not already in memory
-        if not memory or memory[-1]["role"] != "user" or memory[-1]["content"] != message:
-            messages.append(HumanMessage(content=message))
-        
-        # Call the model
-        response = chat(messages)
-        
+        # Get the shared ChatOpenAI client
+        chat = get_gpt_client()
+
+        # Convert memory format to LangChain message format, off the event loop since an image's first use reads and encodes its blob
+        messages = await run_blocking(_build_messages, message, memory)
+
+        # Call the model without blocking the event loop
+        response = await chat.ainvoke(messages)
+
         # Return the response content
         return response.content
     except Exception as e:
         print(f"Error calling GPT: {str(e)}")
         return f"I'm sorry, I encountered an error while processing your request with GPT-4o. Please try again later."
+
+async def stream_gpt(message: str, memory: List[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Stream the OpenAI GPT model response token by token"""
+    try:
+        # Get the shared ChatOpenAI client
+        chat = get_gpt_client()
+
+        # Convert memory format off the event loop, since an image's first use reads and encodes its blob
+        messages = await run_blocking(_build_messages, message, memory)
+
+        # Yield tokens as they arrive from the provider
+        async for chunk in chat.astream(messages):
+            if chunk.content:
+                yield chunk.content
     except Exception as e:
-        print(f"Error calling GPT: {str(e)}")
-        return f"I'm sorry, I encountered an error while processing your request with GPT-4o. Please try again later."
\ No newline at end of file
+        print(f"Error streaming GPT: {str(e)}")
+        # Re-raise so the router can tell a failed stream from a complete one
+        raise
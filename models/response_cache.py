@@ -0,0 +1,227 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from utils.logger import get_logger
+
+# Load environment variables
+load_dotenv()
+
+# Set up logger
+logger = get_logger("response_cache")
+
+# Models whose responses are cached, e.g. "gemini-2.0-flash,deepseek-v3"; empty disables the cache
+RESPONSE_CACHE_MODELS = [m.strip() for m in os.getenv("RESPONSE_CACHE_MODELS", "").split(",") if m.strip()]
+
+# Seconds a cached response stays valid
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+
+# Maximum number of responses held in memory
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+
+# Optional SQLite database for a persistent second tier; empty keeps the cache in memory only
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "")
+
+# Minimum seconds between sweeps of expired rows from the SQLite tier
+PRUNE_INTERVAL = 60.0
+
+# Provider wrappers report failures as a reply starting with this, which must never be cached
+ERROR_RESPONSE_PREFIX = "I'm sorry, I encountered an error"
+
+def _normalize_text(text: str) -> str:
+    """Collapse whitespace so trivially different prompts share a cache entry"""
+    return re.sub(r"\s+", " ", text).strip()
+
+def _normalize_content(content: Any) -> Any:
+    """Reduce message content to what determines the model's answer"""
+    if isinstance(content, dict):
+        if content.get("type") == "image":
+            # Identify images by content hash rather than by payload
+            image = content.get("blob") or hashlib.sha256(content.get("base64", "").encode("utf-8")).hexdigest()
+            return {"image": image, "metadata": _normalize_text(content.get("metadata", ""))}
+        return _normalize_text(str(content.get("content", "")))
+    return _normalize_text(str(content))
+
+def cache_key(model: str, message: str, memory: List[Dict[str, Any]]) -> str:
+    """Hash the model, the normalized context window and the message into a cache key
+
+    Args:
+        model: The model the prompt is for
+        message: The current user message
+        memory: The context window sent with the message
+
+    Returns:
+        The hex SHA-256 cache key
+    """
+    window = [[msg["role"], _normalize_content(msg["content"])] for msg in memory]
+    payload = json.dumps([model, window, _normalize_text(message)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """Cache of LLM responses for identical prompts, with TTL and LRU eviction
+
+    Responses are held in an in-memory LRU tier and, optionally, a SQLite tier
+    that survives restarts. Only models listed as enabled are cached, since
+    caching only makes sense for models run with deterministic settings.
+    """
+
+    def __init__(self, models: List[str], ttl: float, max_entries: int, db_path: str = ""):
+        """Initialize the response cache
+
+        Args:
+            models: Models whose responses may be cached
+            ttl: Seconds a cached response stays valid
+            max_entries: Maximum number of responses held in memory
+            db_path: Optional SQLite database path for the persistent tier
+        """
+        self.models = set(models)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._last_prune = 0.0
+        self.counters: Counter = Counter()
+
+    def enabled_for(self, model: str) -> bool:
+        """Check whether responses from a model are cached"""
+        return model in self.models
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the SQLite tier on first use"""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            with self._db:
+                self._db.execute("""
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """)
+                self._db.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_expires_at ON response_cache (expires_at)")
+        return self._db
+
+    def _db_get(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        with self._db_lock:
+            row = self._connect().execute(
+                "SELECT expires_at, response FROM response_cache WHERE cache_key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def _db_set(self, key: str, model: str, response: str, expires_at: float) -> None:
+        with self._db_lock, self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO response_cache (cache_key, model, response, expires_at) VALUES (?, ?, ?, ?)",
+                (key, model, response, expires_at)
+            )
+            # Drop expired rows now and then so the table doesn't grow without bound
+            now = time.time()
+            if now - self._last_prune >= PRUNE_INTERVAL:
+                db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+                self._last_prune = now
+
+    def _remember(self, key: str, expires_at: float, response: str) -> None:
+        self._entries[key] = (expires_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get(self, model: str, message: str, memory: List[Dict[str, Any]]) -> Optional[str]:
+        """Look up a cached response
+
+        Args:
+            model: The model the prompt is for
+            message: The current user message
+            memory: The context window sent with the message
+
+        Returns:
+            The cached response, or None on a miss or if the model is not cached
+        """
+        if not self.enabled_for(model):
+            return None
+
+        key = cache_key(model, message, memory)
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                self._entries.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[1]
+            del self._entries[key]
+            self.counters["expired"] += 1
+
+        if self.db_path:
+            try:
+                entry = await asyncio.to_thread(self._db_get, key, now)
+            except Exception as e:
+                logger.error(f"Error reading response cache: {str(e)}")
+                entry = None
+            if entry is not None:
+                self._remember(key, *entry)
+                self.counters["hits"] += 1
+                self.counters["db_hits"] += 1
+                return entry[1]
+
+        self.counters["misses"] += 1
+        return None
+
+    async def set(self, model: str, message: str, memory: List[Dict[str, Any]], response: str) -> None:
+        """Cache a response, unless the model is not cached or the response is an error
+
+        Args:
+            model: The model the prompt is for
+            message: The current user message
+            memory: The context window sent with the message
+            response: The model's complete response
+        """
+        if not self.enabled_for(model) or not response or response.startswith(ERROR_RESPONSE_PREFIX):
+            return
+
+        key = cache_key(model, message, memory)
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, response)
+
+        if self.db_path:
+            try:
+                await asyncio.to_thread(self._db_set, key, model, response, expires_at)
+            except Exception as e:
+                logger.error(f"Error writing response cache: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the cache"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "models": sorted(self.models),
+            "entries": len(self._entries),
+            "hits": self.counters["hits"],
+            "db_hits": self.counters["db_hits"],
+            "misses": self.counters["misses"],
+            "expired": self.counters["expired"],
+            "evictions": self.counters["evictions"],
+            "hit_rate": self.counters["hits"] / lookups if lookups else 0.0
+        }
+
+    def close(self) -> None:
+        """Close the SQLite tier, if it was opened"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+# Global response cache shared by the router
+response_cache = ResponseCache(RESPONSE_CACHE_MODELS, RESPONSE_CACHE_TTL, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_DB)
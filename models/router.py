@@ -1,10 +1,14 @@
 import os
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, AsyncIterator
 from dotenv import load_dotenv
 from backend.session import get_user_model
-from models.gpt import call_gpt
-from models.gemini import call_gemini
-from models.deepseek import call_deepseek
+from models.gpt import call_gpt, stream_gpt, get_gpt_client
+from models.gemini import call_gemini, stream_gemini, get_gemini_client
+from models.deepseek import call_deepseek, stream_deepseek
+from models.context import prepare_prompt
+from models.response_cache import response_cache
+from utils.thread_pool import run_blocking
 
 # Load environment variables
 load_dotenv()
@@ -12,27 +16,39 @@ load_dotenv()
 # Default model if not specified
 DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "gemini-2.0-flash")
 
-# User model preferences
-user_models: Dict[str, str] = {}
+# Maximum number of session model preferences cached in the router
+ROUTER_MODEL_CACHE_SIZE = int(os.getenv("ROUTER_MODEL_CACHE_SIZE", "10000"))
 
-def set_user_model(user_id: str, model: str, context_id: Optional[str] = None) -> None:
+# User model preferences, least recently used first; the session store keeps the durable copy
+user_models: "OrderedDict[str, str]" = OrderedDict()
+
+async def set_user_model(user_id: str, model: str, context_id: Optional[str] = None) -> None:
     """Set the LLM model for a specific user"""
     from backend.session import set_user_model as session_set_user_model
     session_key = f"{user_id}:{context_id}" if context_id else user_id
     user_models[session_key] = model
-    session_set_user_model(user_id, model, context_id)  # Sync with session storage
+    user_models.move_to_end(session_key)
+    while len(user_models) > ROUTER_MODEL_CACHE_SIZE:
+        user_models.popitem(last=False)
+    await session_set_user_model(user_id, model, context_id)  # Sync with session storage
 
-def get_model_for_user(user_id: str, context_id: Optional[str] = None) -> str:
+async def get_model_for_user(user_id: str, context_id: Optional[str] = None) -> str:
     """Get the model preference for a specific user"""
+    # Check if user has a model preference in session
+    session_model = await get_user_model(user_id, context_id)
+    return resolve_model(user_id, context_id, session_model)
+
+def resolve_model(user_id: str, context_id: Optional[str] = None, session_model: Optional[str] = None) -> str:
+    """Pick the model for a user from an already-loaded session model preference"""
     # Generate session key
     session_key = f"{user_id}:{context_id}" if context_id else user_id
     
     # Check if user has a model preference
     if session_key in user_models:
+        user_models.move_to_end(session_key)
         return user_models[session_key]
     
     # Check if user has a model preference in session
-    session_model = get_user_model(user_id, context_id)
     if session_model:
         return session_model
     
@@ -47,23 +63,85 @@ VALID_MODELS = {
     "deepseek-v3": call_deepseek
 }
 
+# Shared client getters for the models that use a long-lived provider client
+MODEL_CLIENTS = {
+    "gpt-4o": get_gpt_client,
+    "gemini-2.0-flash": lambda: get_gemini_client("gemini-2.0-flash"),
+    "gemini-2.5-pro-experimental": lambda: get_gemini_client("gemini-2.5-pro-experimental")
+}
+
+def init_model_clients() -> None:
+    """Build the shared provider clients for every model up front"""
+    for model, get_client in MODEL_CLIENTS.items():
+        try:
+            get_client()
+        except Exception as e:
+            print(f"Error initializing client for {model}: {str(e)}")
+
+async def get_llm_response(user_id: str, message: str, memory: List[Dict[str, str]], context_id: Optional[str] = None, model: Optional[str] = None) -> str:
+    """Route the request to the appropriate LLM based on user preference, unless a model is given"""
+    model = model or await get_model_for_user(user_id, context_id)
+    
+    # Fit the history into the model's token budget; this may load document indexes from disk
+    message, memory = await run_blocking(prepare_prompt, message, memory, model)
 
-async def get_llm_response(user_id: str, message: str, memory: List[Dict[str, str]], context_id: Optional[str] = None) -> str:
-    """Route the request to the appropriate LLM based on user preference"""
-    model = get_model_for_user(user_id, context_id)
+    # Serve repeated prompts from the response cache for models that opt in
+    cached = await response_cache.get(model, message, memory)
+    if cached is not None:
+        return cached
     
     try:
         if model == "gpt-4o":
-            return await call_gpt(message, memory)
+            response = await call_gpt(message, memory)
         elif model == "gemini-2.0-flash":
-            return await call_gemini(message, memory, model="gemini-2.0-flash")
+            response = await call_gemini(message, memory, model="gemini-2.0-flash")
         elif model == "gemini-2.5-pro-experimental":
-            return await call_gemini(message, memory, model="gemini-2.5-pro-experimental")
+            response = await call_gemini(message, memory, model="gemini-2.5-pro-experimental")
         elif model == "deepseek-v3":
-            return await call_deepseek(message, memory)
+            response = await call_deepseek(message, memory)
         else:
             # Fallback to default model
-            return await call_gpt(message, memory)
+            response = await call_gpt(message, memory)
+
+        await response_cache.set(model, message, memory, response)
+        return response
     except Exception as e:
         print(f"Error calling LLM: {str(e)}")
-        return f"I'm sorry, I encountered an error while processing your request. Please try again later."
\ No newline at end of file
+        return f"I'm sorry, I encountered an error while processing your request. Please try again later."
+
+async def stream_llm_response(user_id: str, message: str, memory: List[Dict[str, str]], context_id: Optional[str] = None, model: Optional[str] = None) -> AsyncIterator[str]:
+    """Route the request to the appropriate LLM and yield response tokens as they arrive"""
+    model = model or await get_model_for_user(user_id, context_id)
+
+    # Fit the history into the model's token budget; this may load document indexes from disk
+    message, memory = await run_blocking(prepare_prompt, message, memory, model)
+
+    # A cached response is sent whole, as a single chunk
+    cached = await response_cache.get(model, message, memory)
+    if cached is not None:
+        yield cached
+        return
+
+    if model == "gpt-4o":
+        stream = stream_gpt(message, memory)
+    elif model == "gemini-2.0-flash":
+        stream = stream_gemini(message, memory, model="gemini-2.0-flash")
+    elif model == "gemini-2.5-pro-experimental":
+        stream = stream_gemini(message, memory, model="gemini-2.5-pro-experimental")
+    elif model == "deepseek-v3":
+        stream = stream_deepseek(message, memory)
+    else:
+        # Fallback to default model
+        stream = stream_gpt(message, memory)
+
+    try:
+        tokens = []
+        async for token in stream:
+            tokens.append(token)
+            yield token
+
+        # Only complete streams are cached; the model wrappers raise when a stream fails partway
+        await response_cache.set(model, message, memory, "".join(tokens))
+    except Exception as e:
+        print(f"Error streaming LLM: {str(e)}")
+        yield f"I'm sorry, I encountered an error while processing your request. Please try again later."
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep test runs from writing log files into the repository's logs/ directory
+os.environ["LOG_DIR"] = tempfile.mkdtemp(prefix="test-logs-")
@@ -0,0 +1,75 @@
+import time
+import asyncio
+from backend.db_storage import AsyncSQLiteStorage
+from backend.session_manager import SessionUnit
+from backend.storage import AsyncMemoryStorage, CachedStorage, MemoryStorage, new_session
+
+class SlowStorage(AsyncMemoryStorage):
+    """Memory storage whose reads take a while, so writes can land mid-read"""
+
+    async def get(self, key):
+        session = await super().get(key)
+        await asyncio.sleep(0.01)
+        return session
+
+def test_generations_are_not_kept_for_idle_sessions():
+    storage = CachedStorage(AsyncMemoryStorage(MemoryStorage()), max_sessions=100)
+
+    async def main():
+        now = time.time()
+        for i in range(5000):
+            key = f"user{i}"
+            await storage.set(key, new_session(now))
+            await storage.append_messages(key, [{"role": "user", "content": "hi"}], 20, now)
+            await storage.get(key)
+        assert storage.stats()["cache"]["tracked_keys"] == 0
+        assert await storage.expire_sessions(now + 1) == 5000
+        await storage.delete("user0")
+
+    asyncio.run(main())
+    assert storage.stats()["cache"]["tracked_keys"] == 0
+    assert not storage._generations and not storage._inflight and not storage._reading
+
+def test_read_racing_a_write_is_not_cached():
+    storage = CachedStorage(SlowStorage(MemoryStorage()), max_sessions=100)
+
+    async def main():
+        await storage.set("user", new_session())
+        storage._cache.clear()
+        read = asyncio.ensure_future(storage.get("user"))
+        await asyncio.sleep(0)
+        await storage.append_messages("user", [{"role": "user", "content": "hi"}], 20, time.time())
+        await read
+        return await storage.get("user")
+
+    session = asyncio.run(main())
+    assert [m["content"] for m in session["messages"]] == ["hi"]
+
+def test_trimmed_history_matches_sqlite(tmp_path):
+    sqlite = AsyncSQLiteStorage(str(tmp_path / "sessions.db"))
+    storage = CachedStorage(sqlite, max_sessions=100)
+    turns = [
+        {"role": "user", "content": "u1"},
+        {"role": "assistant", "content": "a1"},
+        {"role": "system", "content": "DOC"},
+        {"role": "user", "content": "u2"},
+        {"role": "assistant", "content": "a2"}
+    ]
+
+    async def main():
+        for turn in turns:
+            await storage.append_messages("user", [turn], 4, time.time())
+        cached = (await storage.get("user"))["messages"]
+        stored = (await sqlite.get("user"))["messages"]
+        await storage.close()
+        return cached, stored
+
+    cached, stored = asyncio.run(main())
+    unit = SessionUnit(storage, "user", None, 4)
+    for turn in turns:
+        unit.add_message(turn)
+
+    expected = ["a1", "DOC", "u2", "a2"]
+    assert [msg["content"] for msg in cached] == expected
+    assert [msg["content"] for msg in stored] == expected
+    assert [msg["content"] for msg in unit.messages] == expected
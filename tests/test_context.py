@@ -0,0 +1,94 @@
+import pytest
+from models import context
+from models.context import build_context, count_message_tokens
+from utils.retrieval import DocumentIndexStore
+
+@pytest.fixture
+def index_store(tmp_path, monkeypatch):
+    store = DocumentIndexStore(str(tmp_path / "index"), cache_size=4)
+    monkeypatch.setattr(context, "document_index", store)
+    return store
+
+def _pages(count: int, words: int = 400):
+    return [{"page": number, "text": " ".join(f"filler{number}x{i}" for i in range(words))} for number in range(1, count + 1)]
+
+def _document(doc_id: str, chunks):
+    return {"type": "document", "doc_id": doc_id, "filename": "manual.pdf", "total_pages": len(chunks), "chunk_count": len(chunks)}
+
+def test_indexed_document_sends_only_relevant_pages(index_store):
+    chunks = _pages(100)
+    chunks[72]["text"] += " The warranty period is seventeen months."
+    index_store.put("manual", chunks)
+    memory = [{"role": "system", "content": _document("manual", chunks)}, {"role": "user", "content": "What is the warranty period?"}]
+
+    fitted = build_context(memory, "gpt-4o", budget=4000)
+    assert "seventeen months" in fitted[0]["content"]
+    assert "[Page 73]" in fitted[0]["content"]
+    assert sum(count_message_tokens(message) for message in fitted) <= 4000
+
+def test_document_with_missing_index_is_left_out(index_store):
+    memory = [
+        {"role": "system", "content": _document("missing", _pages(3))},
+        {"role": "user", "content": "What does the manual say?"}
+    ]
+    fitted = build_context(memory, "gpt-4o", budget=600)
+    assert fitted == [memory[-1]]
+
+def test_document_header_alone_over_budget_is_left_out(index_store):
+    chunks = _pages(3)
+    index_store.put("manual", chunks)
+    memory = [{"role": "system", "content": _document("manual", chunks)}, {"role": "user", "content": "question"}]
+    fitted = build_context(memory, "gpt-4o", budget=count_message_tokens(memory[-1]) + 5)
+    assert fitted == [memory[-1]]
+
+def _random_text(rng, max_words: int) -> str:
+    return " ".join(rng.choice(["alpha", "beta", "gamma", "delta", "warranty", "période", "x" * 30, "\n"]) for _ in range(rng.randint(1, max_words)))
+
+def _random_memory(rng, index_store):
+    memory = []
+    for turn in range(rng.randint(0, 40)):
+        kind = rng.random()
+        if kind < 0.1:
+            chunks = [{"page": number, "text": _random_text(rng, 600)} for number in range(1, rng.randint(1, 12))]
+            memory.append({"role": "system", "content": {"type": "document", "filename": "inline.pdf", "total_pages": len(chunks), "chunks": chunks}})
+        elif kind < 0.2:
+            chunks = [{"section": number, "text": _random_text(rng, 600)} for number in range(1, rng.randint(2, 30))]
+            doc_id = f"doc{turn}-{rng.random()}"
+            if rng.random() < 0.8:
+                index_store.put(doc_id, chunks)
+            memory.append({"role": "system", "content": {"type": "document", "filename": "notes.docx", "doc_id": doc_id, "chunk_count": len(chunks)}})
+        elif kind < 0.3:
+            memory.append({"role": "system", "content": {"type": "image", "metadata": _random_text(rng, 20), "blob": "ab" * 32, "mime_type": "image/jpeg"}})
+        elif kind < 0.35:
+            memory.append({"role": "system", "content": "Summary of the earlier conversation: " + _random_text(rng, 300), "summary": True})
+        else:
+            memory.append({"role": rng.choice(["user", "assistant"]), "content": _random_text(rng, 400)})
+    # The latest message is sometimes far larger than any budget
+    memory.append({"role": "user", "content": _random_text(rng, rng.choice([20, 200, 20000]))})
+    return memory
+
+@pytest.mark.parametrize("seed", range(20))
+def test_build_context_never_exceeds_the_budget(seed, index_store):
+    import random
+    rng = random.Random(seed)
+    for _ in range(10):
+        memory = _random_memory(rng, index_store)
+        budget = rng.choice([50, 300, 600, 1500, 4000, 24000])
+        fitted = build_context(memory, "gpt-4o", budget=budget)
+
+        assert sum(count_message_tokens(message) for message in fitted) <= budget
+        # The latest message is kept, truncated if needed, whenever anything fits
+        if fitted:
+            assert fitted[-1]["role"] == "user"
+            assert memory[-1]["content"].startswith(fitted[-1]["content"].split("\n[... content truncated")[0])
+
+        # Kept messages stay in their original order
+        roles = [message["role"] for message in memory]
+        positions = []
+        start = 0
+        for message in fitted:
+            while roles[start] != message["role"]:
+                start += 1
+            positions.append(start)
+            start += 1
+        assert positions == sorted(positions)
@@ -0,0 +1,45 @@
+import os
+from utils.parse_cache import ParseCache
+from utils.retrieval import DocumentIndexStore
+
+def _chunks(word: str):
+    return [{"page": 1, "text": " ".join(f"{word}{i}" for i in range(200))}]
+
+def test_retrieval_index_evicts_least_recently_used(tmp_path):
+    store = DocumentIndexStore(str(tmp_path), cache_size=1, max_bytes=1 << 20)
+    for doc_id in ("aa1", "bb2"):
+        store.put(doc_id, _chunks(doc_id))
+    size = store.stats()["bytes"] // 2
+
+    # Reading the first index makes the second the least recently used
+    store._loaded.clear()
+    assert store.get("aa1") is not None
+    store._files.max_bytes = size * 2
+    store.put("cc3", _chunks("cc3"))
+
+    stats = store.stats()
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= stats["max_bytes"]
+    assert not os.path.exists(store._path("bb2"))
+    store._loaded.clear()
+    assert store.get("bb2") is None
+    assert store.get("aa1") is not None
+
+    # Uploading the document again rebuilds its index
+    store.put("bb2", _chunks("bb2"))
+    store._loaded.clear()
+    assert store.get("bb2") is not None
+
+def test_stores_recover_their_size_after_restart(tmp_path):
+    cache = ParseCache(str(tmp_path / "parse"), max_bytes=1 << 20)
+    cache.put(ParseCache.key(b"x", "pdf"), {"type": "text", "content": "hello"})
+    store = DocumentIndexStore(str(tmp_path / "index"), cache_size=1)
+    store.put("dd4", _chunks("dd4"))
+
+    reopened_cache = ParseCache(str(tmp_path / "parse"), max_bytes=1 << 20)
+    reopened_store = DocumentIndexStore(str(tmp_path / "index"), cache_size=1)
+    assert reopened_cache.get(ParseCache.key(b"x", "pdf")) == {"type": "text", "content": "hello"}
+    assert reopened_cache.stats()["bytes"] == cache.stats()["bytes"]
+    assert reopened_store.get("dd4") is not None
+    assert reopened_store.stats()["bytes"] == store.stats()["bytes"]
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names if not name.endswith(".json")]
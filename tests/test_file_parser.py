@@ -0,0 +1,30 @@
+import asyncio
+import threading
+from utils import file_parser
+from utils.blob_store import BlobStore
+
+def test_parse_image_stores_blobs_off_the_event_loop(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    put_threads = []
+    original_put = store.put
+
+    def put(content):
+        put_threads.append(threading.current_thread())
+        return original_put(content)
+
+    async def preprocess(*args):
+        return {
+            "data": b"image", "thumbnail": b"thumb", "mime_type": "image/jpeg", "format": "JPEG", "source_format": "PNG",
+            "mode": "RGB", "width": 10, "height": 10, "original_width": 20, "original_height": 20
+        }
+
+    monkeypatch.setattr(store, "put", put)
+    monkeypatch.setattr(file_parser, "blob_store", store)
+    monkeypatch.setattr(file_parser.parse_pool, "run", preprocess)
+
+    result = asyncio.run(file_parser.parse_image(b"raw"))
+    assert result["type"] == "image"
+    assert bytes(store.get(result["blob"])) == b"image"
+    assert bytes(store.get(result["thumbnail"])) == b"thumb"
+    assert len(put_threads) == 2
+    assert threading.main_thread() not in put_threads
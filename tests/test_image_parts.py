@@ -0,0 +1,61 @@
+import io
+import pytest
+from PIL import Image
+from models import gemini, gpt
+from utils import image_pipeline
+from utils.blob_store import BlobStore
+from utils.image_pipeline import PreparedPartCache
+
+# Turns sent after the first, each rebuilding the whole history
+LATER_TURNS = 5
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(str(tmp_path))
+    monkeypatch.setattr(image_pipeline, "blob_store", store)
+    monkeypatch.setattr("utils.blob_store.blob_store", store)
+    monkeypatch.setattr(image_pipeline, "_variants", {})
+    cache = PreparedPartCache(64 * 1024 * 1024)
+    monkeypatch.setattr(gpt, "image_part_cache", cache)
+    monkeypatch.setattr(gemini, "image_part_cache", cache)
+    return store
+
+def _image_message(store: BlobStore, shade: int):
+    # 1024x1024 is stored as-is but exceeds GPT-4o's short side, so GPT needs a resized variant
+    image = Image.new("RGB", (1024, 1024), (shade, 255 - shade, 128))
+    buffered = io.BytesIO()
+    image.save(buffered, format="JPEG")
+    content = {"type": "image", "blob": store.put(buffered.getvalue()), "mime_type": "image/jpeg", "width": 1024, "height": 1024, "metadata": f"Image {shade}"}
+    return {"role": "system", "content": content}
+
+def _build_all(memory):
+    gpt._build_messages("next question", memory)
+    gemini._build_history(memory, "next question", "gemini-2.0-flash")
+
+@pytest.mark.parametrize("images", [1, 8])
+def test_later_turns_reuse_image_parts_without_touching_the_image(store, monkeypatch, images):
+    memory = [_image_message(store, shade * 30) for shade in range(images)]
+    memory += [{"role": "user", "content": "what is this?"}, {"role": "assistant", "content": "a square"}]
+    _build_all(memory)
+    cache = gpt.image_part_cache
+    assert cache.stats()["misses"] == 2 * images
+    assert len(image_pipeline._variants) == images
+
+    calls = []
+    def forbidden(name):
+        def call(*args, **kwargs):
+            calls.append(name)
+            raise AssertionError(f"{name} called on a later turn")
+        return call
+
+    monkeypatch.setattr(store, "get", forbidden("blob_store.get"))
+    monkeypatch.setattr(image_pipeline, "resize_for_limits", forbidden("resize_for_limits"))
+    monkeypatch.setattr(Image, "open", forbidden("Image.open"))
+
+    for _ in range(LATER_TURNS):
+        _build_all(memory)
+
+    stats = cache.stats()
+    assert calls == []
+    assert stats["misses"] == 2 * images
+    assert stats["hits"] == 2 * images * LATER_TURNS
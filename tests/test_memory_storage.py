@@ -0,0 +1,27 @@
+from backend.storage import MemoryStorage, new_session
+
+def test_touched_sessions_are_not_reindexed_on_expiry():
+    storage = MemoryStorage()
+    for i in range(10):
+        storage.set(f"user{i}", new_session(float(i)))
+    # Touching every session leaves a stale heap entry behind for each
+    for i in range(10):
+        storage.set(f"user{i}", new_session(100.0 + i))
+
+    assert storage.expire_sessions(50.0) == 0
+    assert len(storage._expiry_heap) == 10
+    assert storage.expire_sessions(105.0) == 5
+    assert sorted(storage.data) == [f"user{i}" for i in range(5, 10)]
+
+def test_stale_entries_count_toward_the_limit():
+    storage = MemoryStorage()
+    for i in range(10):
+        storage.set(f"user{i}", new_session(float(i)))
+    for i in range(5):
+        storage.set(f"user{i}", new_session(100.0 + i))
+
+    # The five stale entries are popped first and use up the batch
+    assert storage.expire_sessions(50.0, limit=5) == 0
+    assert len(storage._expiry_heap) == 10
+    assert storage.expire_sessions(50.0, limit=5) == 5
+    assert sorted(storage.data) == [f"user{i}" for i in range(5)]
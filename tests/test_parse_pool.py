@@ -0,0 +1,85 @@
+import io
+import time
+import asyncio
+import pytest
+from pypdf import PdfWriter
+from utils import parse_pool
+from utils.parse_pool import ParsePool, ParseTimeoutError, ParserBusyError, extract_pdf_pages
+
+async def _warm(pool: ParsePool) -> None:
+    """Start the worker processes, so process startup isn't timed"""
+    await asyncio.gather(*(pool.run(time.sleep, 0.01) for _ in range(pool.max_workers)))
+
+def test_time_queued_for_a_worker_does_not_count_toward_the_timeout():
+    pool = ParsePool(max_workers=2, max_pending=8, timeout=1.0)
+
+    async def main():
+        await _warm(pool)
+        # Four 0.6s jobs on two workers: the last two finish 1.2s after submission
+        return await asyncio.gather(*(pool.run(time.sleep, 0.6) for _ in range(4)))
+
+    try:
+        assert asyncio.run(main()) == [None] * 4
+        assert pool.stats()["timeouts"] == 0
+    finally:
+        pool.shutdown()
+
+def test_timeout_kills_only_the_stuck_document():
+    pool = ParsePool(max_workers=2, max_pending=8, timeout=1.0)
+
+    async def healthy():
+        # Still parsing when the stuck document times out at 1.0s
+        await asyncio.sleep(0.7)
+        await pool.run(time.sleep, 0.6)
+        return "parsed"
+
+    async def main():
+        await _warm(pool)
+        return await asyncio.gather(pool.run(time.sleep, 10), healthy(), return_exceptions=True)
+
+    try:
+        stuck, result = asyncio.run(main())
+        assert isinstance(stuck, ParseTimeoutError)
+        assert result == "parsed"
+        assert pool.stats()["retried"] == 1
+    finally:
+        pool.shutdown()
+
+def test_saturated_pool_rejects_new_documents():
+    pool = ParsePool(max_workers=1, max_pending=1, timeout=5.0)
+
+    async def main():
+        first = asyncio.ensure_future(pool.run(time.sleep, 0.2))
+        await asyncio.sleep(0)
+        with pytest.raises(ParserBusyError):
+            await pool.run(time.sleep, 0.01)
+        await first
+
+    try:
+        asyncio.run(main())
+        assert pool.stats()["rejected"] == 1
+    finally:
+        pool.shutdown()
+
+def _blank_pdf(pages: int) -> bytes:
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=72, height=72)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+@pytest.mark.parametrize("max_pages, max_chars, kept, truncated", [(3, 10000, 3, True), (10, 12, 2, True), (10, 10000, 6, False), (6, 10000, 6, False)])
+def test_pdf_extraction_stops_at_the_limit(monkeypatch, max_pages, max_chars, kept, truncated):
+    extracted = []
+
+    def pages(reader, first_page=1, last_page=None):
+        for number in range(first_page, len(reader.pages) + 1):
+            extracted.append(number)
+            yield number, f"page {number} "
+
+    monkeypatch.setattr(parse_pool, "iter_pdf_pages", pages)
+    result = extract_pdf_pages(_blank_pdf(6), max_pages, max_chars)
+    assert [chunk["page"] for chunk in result["chunks"]] == list(range(1, kept + 1))
+    assert extracted == list(range(1, kept + 1))
+    assert result["truncated"] is truncated
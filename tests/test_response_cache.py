@@ -0,0 +1,46 @@
+import asyncio
+import sqlite3
+from models import router
+from models.response_cache import ResponseCache
+
+def _collect(stream):
+    async def main():
+        return [token async for token in stream]
+    return asyncio.run(main())
+
+def test_failed_stream_is_not_cached(monkeypatch):
+    cache = ResponseCache(["deepseek-v3"], ttl=60, max_entries=10)
+    monkeypatch.setattr(router, "response_cache", cache)
+
+    async def failing_stream(message, memory):
+        yield "Partial answer "
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(router, "stream_deepseek", failing_stream)
+    tokens = _collect(router.stream_llm_response("user", "question", [], model="deepseek-v3"))
+    assert tokens[0] == "Partial answer "
+    assert tokens[-1].startswith("I'm sorry, I encountered an error")
+    assert cache.stats()["entries"] == 0
+
+    async def complete_stream(message, memory):
+        yield "Full "
+        yield "answer"
+
+    monkeypatch.setattr(router, "stream_deepseek", complete_stream)
+    assert "".join(_collect(router.stream_llm_response("user", "question", [], model="deepseek-v3"))) == "Full answer"
+    assert asyncio.run(cache.get("deepseek-v3", "question", [{"role": "user", "content": "question"}])) == "Full answer"
+
+def test_sqlite_tier_indexes_expiry(tmp_path):
+    cache = ResponseCache(["deepseek-v3"], ttl=60, max_entries=10, db_path=str(tmp_path / "cache.db"))
+    asyncio.run(cache.set("deepseek-v3", "question", [], "answer"))
+    cache.close()
+
+    # A fresh instance reads the response back from SQLite
+    cache = ResponseCache(["deepseek-v3"], ttl=60, max_entries=10, db_path=str(tmp_path / "cache.db"))
+    assert asyncio.run(cache.get("deepseek-v3", "question", [])) == "answer"
+    cache.close()
+
+    db = sqlite3.connect(str(tmp_path / "cache.db"))
+    plan = " ".join(row[-1] for row in db.execute("EXPLAIN QUERY PLAN DELETE FROM response_cache WHERE expires_at <= 0"))
+    db.close()
+    assert "idx_response_cache_expires_at" in plan
@@ -0,0 +1,50 @@
+import asyncio
+import pytest
+from backend.db_storage import AsyncSQLiteStorage
+from backend.session_manager import SessionManager
+from backend.storage import AsyncMemoryStorage, CachedStorage, LRUMemoryStorage, MemoryStorage
+
+SESSIONS = 4
+TURNS = 300
+
+STORAGES = {
+    "memory": lambda tmp_path: AsyncMemoryStorage(MemoryStorage()),
+    "lru": lambda tmp_path: AsyncMemoryStorage(LRUMemoryStorage(max_sessions=100)),
+    "cached_sqlite": lambda tmp_path: CachedStorage(AsyncSQLiteStorage(str(tmp_path / "sessions.db")), max_sessions=100)
+}
+
+@pytest.mark.parametrize("exclusive", [False, True], ids=["shared", "exclusive"])
+@pytest.mark.parametrize("backend", list(STORAGES))
+def test_concurrent_turns_are_never_lost(backend, exclusive, tmp_path):
+    manager = SessionManager(STORAGES[backend](tmp_path), max_memory_size=SESSIONS * TURNS * 2)
+
+    async def turn(user: int, number: int) -> None:
+        async with manager.session_scope(f"user{user}", exclusive=exclusive) as session:
+            session.add_message({"role": "user", "content": f"question {number}"})
+            # Stand-in for the LLM call, letting other requests for the session run meanwhile
+            await asyncio.sleep(0)
+            session.add_message({"role": "assistant", "content": f"answer {number}"})
+
+    async def main():
+        await asyncio.gather(*(turn(user, number) for number in range(TURNS) for user in range(SESSIONS)))
+        memories = [await manager.get_memory(f"user{user}") for user in range(SESSIONS)]
+        await manager.storage.close()
+        return memories
+
+    for messages in asyncio.run(main()):
+        contents = [message["content"] for message in messages]
+        assert len(contents) == TURNS * 2
+        assert sorted(contents) == sorted([f"question {n}" for n in range(TURNS)] + [f"answer {n}" for n in range(TURNS)])
+        if exclusive:
+            # Requests ran one at a time, so every answer directly follows its question
+            assert all(contents[i + 1] == contents[i].replace("question", "answer") for i in range(0, len(contents), 2))
+    assert len(manager.locks) == 0
+
+def test_units_share_the_manager_locks():
+    manager = SessionManager(AsyncMemoryStorage(MemoryStorage()))
+
+    async def main():
+        # No lock is held yet, so the manager's lock table is empty
+        return await manager.load_session("user")
+
+    assert asyncio.run(main()).locks is manager.locks
@@ -0,0 +1,36 @@
+import asyncio
+from fastapi.testclient import TestClient
+from backend import service
+from backend.main import app
+from backend.storage import count_storage_ops
+
+async def _fake_llm_response(user_id, message, memory, context_id=None, model=None):
+    return "answer"
+
+def test_chat_loads_and_flushes_the_session_once(monkeypatch):
+    monkeypatch.setattr(service, "get_llm_response", _fake_llm_response)
+
+    async def main():
+        # The first turn creates the session, later turns find it
+        for _ in range(3):
+            with count_storage_ops() as counts:
+                assert await service.chat("ops-user", "hello") == "answer"
+            assert counts == {"get": 1, "append_messages": 1}
+
+    asyncio.run(main())
+
+def test_chat_reports_storage_ops_in_a_header(monkeypatch):
+    monkeypatch.setattr(service, "get_llm_response", _fake_llm_response)
+    response = TestClient(app).post("/chat", json={"user_id": "header-user", "message": "hello"})
+    assert response.json() == {"response": "answer"}
+    assert response.headers["X-Storage-Ops"] == "2"
+
+def test_streamed_chat_has_no_storage_ops_header(monkeypatch):
+    async def fake_stream(user_id, message, memory, context_id=None, model=None):
+        yield "ans"
+        yield "wer"
+
+    monkeypatch.setattr(service, "stream_llm_response", fake_stream)
+    response = TestClient(app).post("/chat/stream", json={"user_id": "stream-user", "message": "hello"})
+    assert response.text == "answer"
+    assert "X-Storage-Ops" not in response.headers
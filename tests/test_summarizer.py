@@ -0,0 +1,57 @@
+import asyncio
+from backend import session as session_module
+from backend import summarizer
+from backend.db_storage import SQLiteStorage
+from backend.session_manager import SessionManager
+from backend.storage import ThreadedStorage
+
+class RacingStorage(ThreadedStorage):
+    """SQLite storage that sends a chat turn while the summarizer reloads the session"""
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        self.summary_ready = False
+        self.chat = None
+
+    async def get(self, key):
+        session = await super().get(key)
+        if self.summary_ready and self.chat is None:
+            # A turn that finishes between the reload and the rewrite must not be overwritten
+            self.chat = asyncio.ensure_future(_chat("late"))
+            await asyncio.sleep(0.05)
+        return session
+
+async def _chat(label: str) -> None:
+    async with session_module.session_scope("user") as session:
+        session.add_message({"role": "user", "content": f"{label} question"})
+        session.add_message({"role": "assistant", "content": f"{label} answer"})
+
+def test_turn_racing_the_summary_rewrite_is_kept(tmp_path, monkeypatch):
+    storage = RacingStorage(SQLiteStorage(str(tmp_path / "sessions.db")))
+    manager = SessionManager(storage, max_memory_size=100)
+    monkeypatch.setattr(session_module, "_session_manager", manager)
+    monkeypatch.setattr(summarizer, "SUMMARY_KEEP_RECENT", 4)
+
+    async def fake_generate(prompt, model):
+        # A turn that finishes while the model is running must be kept too
+        await _chat("during")
+        storage.summary_ready = True
+        return "earlier turns"
+
+    monkeypatch.setattr(summarizer, "generate_gemini", fake_generate)
+
+    async def main():
+        for number in range(10):
+            await _chat(f"turn {number}")
+        await summarizer._summarize("user", None, "user")
+        await storage.chat
+        messages = await session_module.get_memory("user")
+        await manager.storage.close()
+        return messages
+
+    contents = [message["content"] for message in asyncio.run(main())]
+    assert contents == [
+        summarizer.SUMMARY_PREFIX + "earlier turns",
+        "turn 8 question", "turn 8 answer", "turn 9 question", "turn 9 answer",
+        "during question", "during answer", "late question", "late answer"
+    ]
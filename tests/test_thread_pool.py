@@ -0,0 +1,25 @@
+import time
+import asyncio
+from utils.thread_pool import InstrumentedThreadPool
+
+def test_idle_pool_reports_no_queue():
+    pool = InstrumentedThreadPool(8)
+    asyncio.run(pool.run(time.sleep, 0.01))
+    stats = pool.stats()
+    assert stats["peak_queued"] == 0
+    assert stats["queued"] == 0
+    assert stats["completed"] == 1
+    pool.shutdown()
+
+def test_calls_beyond_the_workers_count_as_queued():
+    pool = InstrumentedThreadPool(2)
+
+    async def main():
+        await asyncio.gather(*(pool.run(time.sleep, 0.05) for _ in range(5)))
+
+    asyncio.run(main())
+    stats = pool.stats()
+    assert stats["peak_queued"] == 3
+    assert stats["queued"] == 0
+    assert stats["active"] == 0
+    pool.shutdown()
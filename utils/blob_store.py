@@ -0,0 +1,78 @@
+import os
+import mmap
+import base64
+import hashlib
+from typing import Any, Dict, Union
+from dotenv import load_dotenv
+from utils.disk_cache import atomic_write, sharded_path
+
+# Load environment variables
+load_dotenv()
+
+# Directory for uploaded attachment blobs
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+
+class BlobStore:
+    """Content-addressed store for attachment bytes on local disk
+
+    Blobs are keyed by the SHA-256 of their content, so the same attachment
+    uploaded any number of times is stored once. Reads are memory-mapped.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return sharded_path(self.root, digest)
+
+    def put(self, content: bytes) -> str:
+        """Store bytes, returning their content hash
+
+        Args:
+            content: The bytes to store
+
+        Returns:
+            The hex SHA-256 digest that references the blob
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+
+        atomic_write(path, content)
+        return digest
+
+    def get(self, digest: str) -> Union[mmap.mmap, bytes]:
+        """Read a blob as a read-only memory map
+
+        Args:
+            digest: The blob's content hash
+
+        Returns:
+            A bytes-like, read-only view of the blob
+        """
+        with open(self._path(digest), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob is stored"""
+        return os.path.exists(self._path(digest))
+
+# Global blob store shared by the parsers and provider wrappers
+blob_store = BlobStore(BLOB_STORE_DIR)
+
+def image_base64(image_data: Dict[str, Any]) -> str:
+    """Get the base64 payload for an image message, resolving blob references lazily
+
+    Args:
+        image_data: An image message's content, holding either a blob reference or legacy inline base64
+
+    Returns:
+        The base64 encoded image
+    """
+    if "base64" in image_data:
+        return image_data["base64"]
+    return base64.b64encode(blob_store.get(image_data["blob"])).decode("utf-8")
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+
+def sharded_path(root: str, key: str, suffix: str = "") -> str:
+    """Build the path for a hash-keyed file, fanned out into subdirectories so no single directory grows too large
+
+    Args:
+        root: The store's root directory
+        key: A key starting with a hex hash
+        suffix: Optional file name suffix, such as ".json"
+
+    Returns:
+        The file path
+    """
+    return os.path.join(root, key[:2], key + suffix)
+
+def atomic_write(path: str, data: Union[bytes, str]) -> None:
+    """Write a file through a temporary file and a rename, so readers never see a partial file
+
+    Args:
+        path: The file to write; missing parent directories are created
+        data: The file contents; text is written as UTF-8
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class LRUDirectory:
+    """Size accounting for the files of an on-disk cache, evicting the least recently used first
+
+    The directory is scanned once on first use, ordering existing files by
+    modification time; uses are recorded on disk too, so the order survives restarts.
+    """
+
+    def __init__(self, root: str, max_bytes: int, suffix: str = ".json"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self._lock = threading.Lock()
+        # File paths to sizes, least recently used first; loaded from disk on first use
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self.total_bytes = 0
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            entries = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith(self.suffix):
+                        stat = os.stat(os.path.join(dirpath, name))
+                        entries.append((stat.st_mtime, os.path.join(dirpath, name), stat.st_size))
+            entries.sort()
+            self._index = OrderedDict((path, size) for _, path, size in entries)
+            self.total_bytes = sum(self._index.values())
+        return self._index
+
+    def touch(self, path: str) -> bool:
+        """Mark a file as just used
+
+        Returns:
+            False if the file is not in the cache
+        """
+        with self._lock:
+            index = self._load_index()
+            if path not in index:
+                return False
+            index.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            self.discard(path)
+            return False
+        return True
+
+    def add(self, path: str, size: int) -> None:
+        """Account for a file just written, deleting the least recently used files beyond the size limit"""
+        with self._lock:
+            index = self._load_index()
+            self.total_bytes += size - index.get(path, 0)
+            index[path] = size
+            index.move_to_end(path)
+
+            while self.total_bytes > self.max_bytes and len(index) > 1:
+                old_path, old_size = index.popitem(last=False)
+                self.total_bytes -= old_size
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+
+    def discard(self, path: str) -> None:
+        """Stop accounting for a file that turned out to be missing or unreadable"""
+        with self._lock:
+            if self._index is not None:
+                self.total_bytes -= self._index.pop(path, 0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._index or ())
@@ -1,80 +1,161 @@
 import os
 import io
+import time
+import asyncio
+from typing import Optional, Tuple
 from fastapi import UploadFile
-from PIL import Image
-from pypdf import PdfReader
-import docx
+from utils.blob_store import blob_store
+from utils.image_pipeline import preprocess_image, IMAGE_MAX_DIMENSION, IMAGE_MAX_BYTES, IMAGE_QUALITY, IMAGE_THUMBNAIL_SIZE
+from utils.parse_pool import parse_pool, extract_pdf_pages, extract_docx_text, ParserBusyError, PARSE_MAX_FILE_BYTES, PARSE_MAX_PDF_PAGES, PARSE_MAX_PDF_CHARS
+from utils.parse_cache import parse_cache
+from utils.retrieval import chunk_text
+from utils.logger import get_logger
+
+# Set up logger
+logger = get_logger("file_parser")
+
+# File types by extension, used to key cached parse results
+FILE_TYPES = {".jpg": "image", ".jpeg": "image", ".png": "image", ".pdf": "pdf", ".docx": "docx", ".doc": "docx"}
 
 async def parse_file(file: UploadFile) -> dict:
     """Parse different file types and extract their content."""
     content = await file.read()
-    _, ext = os.path.splitext(file.filename)
+    try:
+        return await parse_content(file.filename, content)
+    finally:
+        await file.seek(0)
+
+def parse_page_range(pages: Optional[str]) -> Tuple[int, Optional[int]]:
+    """Parse a page selection such as "5", "3-10" or "12-" into (first page, last page or None)."""
+    if not pages or not pages.strip():
+        return 1, None
+    first, sep, last = pages.strip().partition("-")
+    first_page = int(first) if first.strip() else 1
+    last_page = (int(last) if last.strip() else None) if sep else first_page
+    if first_page < 1 or (last_page is not None and last_page < first_page):
+        raise ValueError(f"Invalid page range: {pages}")
+    return first_page, last_page
+
+async def parse_content(filename: str, content: bytes, pages: Optional[str] = None) -> dict:
+    """Parse raw file bytes based on the file name's extension, reusing cached results.
+
+    pages optionally selects a page range of a PDF, such as "3-10". Document results
+    carry a doc_id derived from the content hash, which keys their retrieval index.
+    """
+    _, ext = os.path.splitext(filename)
     ext = ext.lower()
 
+    file_type = FILE_TYPES.get(ext)
+    if file_type is None:
+        return {"type": "error", "content": f"Unsupported file type: {ext}. Please upload JPG, PNG, PDF, or DOCX files."}
+    if len(content) > PARSE_MAX_FILE_BYTES:
+        return {"type": "error", "content": f"File is too large to parse. The limit is {PARSE_MAX_FILE_BYTES // (1024 * 1024)} MB."}
+
+    page_range = (1, None)
+    if file_type == "pdf":
+        try:
+            page_range = parse_page_range(pages)
+        except ValueError as e:
+            return {"type": "error", "content": str(e)}
+
+    # The same bytes always parse to the same result, so repeated uploads skip parsing
+    key = parse_cache.key(content, file_type)
+    if page_range != (1, None):
+        key += f"-p{page_range[0]}-{page_range[1] or ''}"
+    cached = await asyncio.to_thread(parse_cache.get, key)
+    if cached is not None and (cached["type"] != "image" or blob_store.exists(cached["blob"])):
+        parse_cache.record(file_type, hit=True)
+        return _with_doc_id(cached, key)
+
+    start = time.perf_counter()
+    result = await _parse(file_type, content, page_range)
+    parse_cache.record(file_type, hit=False, parse_seconds=time.perf_counter() - start)
+
+    if _cacheable(result):
+        try:
+            await asyncio.to_thread(parse_cache.put, key, result)
+        except Exception as e:
+            logger.error(f"Error caching parsed file: {str(e)}")
+    return _with_doc_id(result, key)
+
+def _with_doc_id(result: dict, key: str) -> dict:
+    """Tag a document result with its document ID, the parse cache key."""
+    if result["type"] != "document":
+        return result
+    return {**result, "doc_id": key}
+
+async def _parse(file_type: str, content: bytes, page_range: Tuple[int, Optional[int]]) -> dict:
+    """Parse raw file bytes of a known file type."""
     try:
-        if ext in {".jpg", ".jpeg", ".png"}:
+        if file_type == "image":
             return await parse_image(content)
-        elif ext == ".pdf":
-            text = await parse_pdf(content)
-            return {"type": "text", "content": text}
-        elif ext in {".docx", ".doc"}:
-            text = await parse_docx(content)
-            return {"type": "text", "content": text}
+        elif file_type == "pdf":
+            return await parse_pdf(content, *page_range)
         else:
-            return {"type": "error", "content": f"Unsupported file type: {ext}. Please upload JPG, PNG, PDF, or DOCX files."}
+            text = await parse_docx(content)
+            if not text or text.startswith("Error processing"):
+                return {"type": "text", "content": text}
+            # Split unpaged text into sections, so it can be indexed like a PDF's pages
+            return {"type": "document", "chunks": chunk_text(text), "truncated": False}
+    except ParserBusyError:
+        raise
     except Exception as e:
         return {"type": "error", "content": f"Error parsing file: {str(e)}"}
-    finally:
-        await file.seek(0)
+
+def _cacheable(result: dict) -> bool:
+    """Whether a parse result is worth caching; failures may be transient, so they are not"""
+    if result["type"] == "error":
+        return False
+    return not (result["type"] == "text" and result["content"].startswith("Error processing"))
 
 async def parse_image(content: bytes) -> dict:
-    """Process image file and return both metadata and base64 encoded image."""
+    """Preprocess an image and return its metadata and a reference to the stored image."""
     try:
-        import base64
-        with Image.open(io.BytesIO(content)) as image:
-            width, height = image.size
-            format_name = image.format
-            mode = image.mode
-            
-            # Convert image to base64 for multimodal models
-            buffered = io.BytesIO()
-            image.save(buffered, format=format_name)
-            img_str = base64.b64encode(buffered.getvalue()).decode('utf-8')
-            
-            # Return both metadata and base64 encoded image
-            return {
-                "type": "image",
-                "metadata": f"Image: {width}x{height} pixels, {format_name} format, {mode} mode.",
-                "base64": img_str,
-                "mime_type": f"image/{format_name.lower()}"
-            }
+        # Orient, downscale and re-encode in the parse process pool
+        image = await parse_pool.run(preprocess_image, content, IMAGE_MAX_DIMENSION, IMAGE_MAX_BYTES, IMAGE_QUALITY, IMAGE_THUMBNAIL_SIZE)
+
+        # Store the image once in the blob store, off the event loop; history only keeps the reference
+        blob = await asyncio.to_thread(blob_store.put, image["data"])
+        result = {
+            "type": "image",
+            "metadata": (
+                f"Image: {image['original_width']}x{image['original_height']} pixels, "
+                f"{image['source_format']} format, sent as {image['width']}x{image['height']} {image['format']}, {image['mode']} mode."
+            ),
+            "blob": blob,
+            "mime_type": image["mime_type"],
+            "width": image["width"],
+            "height": image["height"]
+        }
+        if image["thumbnail"] is not None:
+            result["thumbnail"] = await asyncio.to_thread(blob_store.put, image["thumbnail"])
+        return result
+    except ParserBusyError:
+        raise
     except Exception as e:
         return {
             "type": "error",
             "content": f"Error processing image: {str(e)}"
         }
 
-async def parse_pdf(content: bytes) -> str:
-    """Extract text from a PDF file using pypdf."""
+async def parse_pdf(content: bytes, first_page: int = 1, last_page: Optional[int] = None) -> dict:
+    """Extract text from a PDF file using pypdf, in the parse process pool, as one chunk per page."""
     try:
-        pdf = PdfReader(io.BytesIO(content))
-        text = ""
-        for page in pdf.pages:
-            text += page.extract_text() or ""
-        return text.strip() if text.strip() else "This PDF appears to be a scanned document with no extractable text."
+        document = await parse_pool.run(extract_pdf_pages, content, PARSE_MAX_PDF_PAGES, PARSE_MAX_PDF_CHARS, first_page, last_page)
+        if not document["chunks"]:
+            return {"type": "text", "content": "This PDF appears to be a scanned document with no extractable text."}
+        return {"type": "document", **document}
+    except ParserBusyError:
+        raise
     except Exception as e:
-        return f"Error processing PDF: {str(e)}"
+        return {"type": "error", "content": f"Error processing PDF: {str(e)}"}
 
 async def parse_docx(content: bytes) -> str:
-    """Extract text from a DOCX file."""
+    """Extract text from a DOCX file, in the parse process pool."""
     try:
-        doc = docx.Document(io.BytesIO(content))
-        text = "\n".join(para.text for para in doc.paragraphs)
-
-        for table in doc.tables:
-            for row in table.rows:
-                text += "\n" + " ".join(cell.text for cell in row.cells)
-
+        text = await parse_pool.run(extract_docx_text, content)
         return text.strip()
+    except ParserBusyError:
+        raise
     except Exception as e:
         return f"Error processing DOCX: {str(e)}"
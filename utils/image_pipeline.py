@@ -0,0 +1,252 @@
+import io
+import os
+import base64
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from utils.blob_store import blob_store, image_base64
+
+# Load environment variables
+load_dotenv()
+
+# Longest side, in pixels, uploaded images are downscaled to before they are stored
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+
+# Largest encoded size, in bytes, of a stored image
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", "1500000"))
+
+# Starting encoder quality for JPEG and WebP output
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+
+# Longest side of the thumbnail kept alongside each image (0 disables thumbnails)
+IMAGE_THUMBNAIL_SIZE = int(os.getenv("IMAGE_THUMBNAIL_SIZE", "256"))
+
+# Largest total size, in bytes of base64, of provider-ready image parts kept in memory
+IMAGE_PART_CACHE_BYTES = int(os.getenv("IMAGE_PART_CACHE_BYTES", "67108864"))
+
+# Lowest quality tried before an image is downscaled further to meet its byte budget
+MIN_QUALITY = 55
+
+# Per-model limits on the image sent with a prompt. max_side caps the longest side and
+# max_short_side the shortest; images beyond what a provider would use are wasted bytes
+MODEL_IMAGE_LIMITS: Dict[str, Dict[str, int]] = {
+    # OpenAI fits high-detail images in 2048x2048, then scales the shortest side to 768
+    "gpt-4o": {"max_side": 2048, "max_short_side": 768, "max_bytes": 1000000},
+    "gemini-2.0-flash": {"max_side": 3072, "max_short_side": 3072, "max_bytes": 1500000},
+    "gemini-2.5-pro-experimental": {"max_side": 3072, "max_short_side": 3072, "max_bytes": 1500000}
+}
+
+def _fit_size(width: int, height: int, max_side: int, max_short_side: Optional[int] = None) -> Tuple[int, int]:
+    """Scale dimensions down, keeping the aspect ratio, so they fit the limits"""
+    scale = min(1.0, max_side / max(width, height))
+    if max_short_side:
+        scale = min(scale, max_short_side / min(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def _encode(image: Any, max_bytes: int, quality: int, try_png: bool = False) -> Tuple[bytes, str, Any]:
+    """Encode an image within a byte budget, lowering quality and then size as needed
+
+    Opaque images are encoded as JPEG; images with transparency as WebP. With
+    try_png, lossless PNG is kept instead when it is smaller, as it is for
+    screenshots and other flat graphics.
+
+    Returns:
+        The encoded bytes, their format, and the image that was encoded, so
+        callers can read its size and mode without decoding the output
+    """
+    from PIL import Image
+
+    has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+    if has_alpha:
+        image, format_name = image.convert("RGBA"), "WEBP"
+    else:
+        image, format_name = image.convert("RGB"), "JPEG"
+
+    if try_png:
+        lossy, lossy_format, lossy_image = _encode(image, max_bytes, quality)
+        buffered = io.BytesIO()
+        image.save(buffered, format="PNG", optimize=True)
+        if buffered.tell() < len(lossy):
+            return buffered.getvalue(), "PNG", image
+        return lossy, lossy_format, lossy_image
+
+    while True:
+        for q in range(quality, MIN_QUALITY - 1, -10):
+            buffered = io.BytesIO()
+            image.save(buffered, format=format_name, quality=q, optimize=True)
+            if buffered.tell() <= max_bytes:
+                return buffered.getvalue(), format_name, image
+        if max(image.size) <= 64:
+            return buffered.getvalue(), format_name, image
+        image = image.resize(_fit_size(*image.size, int(max(image.size) * 0.75)), Image.LANCZOS)
+
+def preprocess_image(content: bytes, max_side: int, max_bytes: int, quality: int, thumbnail_size: int) -> Dict[str, Any]:
+    """Orient, downscale and re-encode an uploaded image (runs in a worker process)
+
+    The upload is decoded exactly once; the output is never decoded again.
+
+    Args:
+        content: The uploaded image bytes
+        max_side: Longest side of the stored image, in pixels
+        max_bytes: Largest encoded size of the stored image
+        quality: Starting encoder quality
+        thumbnail_size: Longest side of the thumbnail, or 0 for none
+
+    Returns:
+        A dictionary with the encoded image, its format and dimensions, and an optional thumbnail
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(content)) as image:
+        original_width, original_height = image.size
+        source_format = image.format
+
+        # Apply the EXIF orientation, so the pixels are upright once the tag is dropped
+        image = ImageOps.exif_transpose(image)
+        if max(image.size) > max_side:
+            image = image.resize(_fit_size(*image.size, max_side), Image.LANCZOS)
+        data, format_name, encoded = _encode(image, max_bytes, quality, try_png=source_format == "PNG")
+        width, height = encoded.size
+        mode = encoded.mode
+
+        thumbnail = None
+        if thumbnail_size:
+            thumb = image.copy()
+            thumb.thumbnail((thumbnail_size, thumbnail_size), Image.LANCZOS)
+            thumbnail, _, _ = _encode(thumb, max_bytes, quality)
+
+    return {
+        "data": data,
+        "format": format_name,
+        "mime_type": f"image/{format_name.lower()}",
+        "width": width,
+        "height": height,
+        "mode": mode,
+        "source_format": source_format,
+        "original_width": original_width,
+        "original_height": original_height,
+        "thumbnail": thumbnail
+    }
+
+def resize_for_limits(content: bytes, limits: Dict[str, int], quality: int) -> Tuple[bytes, str]:
+    """Downscale and re-encode an image to fit a model's limits
+
+    Returns:
+        The encoded bytes and their MIME type
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(content)) as image:
+        source_format = image.format
+        size = _fit_size(*image.size, limits["max_side"], limits.get("max_short_side"))
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        data, format_name, _ = _encode(image, limits["max_bytes"], quality, try_png=source_format == "PNG")
+    return data, f"image/{format_name.lower()}"
+
+# Per-model variants already prepared, keyed by (source blob, model)
+_variants: Dict[Tuple[str, str], Tuple[str, str]] = {}
+_variants_lock = threading.Lock()
+
+def _needs_variant(image_data: Dict[str, Any], limits: Dict[str, int]) -> bool:
+    """Whether a stored image exceeds a model's limits"""
+    width, height = image_data.get("width"), image_data.get("height")
+    if not width or not height:
+        return False
+    return _fit_size(width, height, limits["max_side"], limits.get("max_short_side")) != (width, height)
+
+def image_for_model(image_data: Dict[str, Any], model: str) -> Tuple[str, str]:
+    """Get an image message's base64 payload and MIME type, sized for a model
+
+    The stored image is used as-is when it is within the model's limits.
+    Otherwise a smaller variant is prepared once, kept in the blob store and reused.
+
+    Args:
+        image_data: An image message's content
+        model: The model the image is sent to
+
+    Returns:
+        A (base64 data, MIME type) tuple
+    """
+    limits = MODEL_IMAGE_LIMITS.get(model)
+    if "blob" not in image_data or limits is None or not _needs_variant(image_data, limits):
+        return image_base64(image_data), image_data["mime_type"]
+
+    key = (image_data["blob"], model)
+    with _variants_lock:
+        variant = _variants.get(key)
+    if variant is None or not blob_store.exists(variant[0]):
+        data, mime_type = resize_for_limits(bytes(blob_store.get(image_data["blob"])), limits, IMAGE_QUALITY)
+        variant = (blob_store.put(data), mime_type)
+        with _variants_lock:
+            _variants[key] = variant
+
+    digest, mime_type = variant
+    return base64.b64encode(blob_store.get(digest)).decode("utf-8"), mime_type
+
+class PreparedPartCache:
+    """LRU cache of provider-ready message parts for stored images, bounded by size
+
+    Building a part reads the blob and base64-encodes it, and may resize the
+    image for the model. Caching the result per (blob, model) means later
+    turns reuse the part without touching the image bytes at all.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._parts: "OrderedDict[Tuple[str, str], Tuple[Any, int]]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+
+    def get(self, image_data: Dict[str, Any], model: str, build: Callable[[str, str], Any]) -> Any:
+        """Get the prepared part for an image message, building and caching it on first use
+
+        Args:
+            image_data: An image message's content
+            model: The model the part is for
+            build: Builds the provider's part from the (base64 data, MIME type) of the image
+
+        Returns:
+            The part returned by build
+        """
+        if "blob" not in image_data:
+            # Legacy inline images already carry their base64 payload
+            return build(*image_for_model(image_data, model))
+
+        key = (image_data["blob"], model)
+        with self._lock:
+            entry = self._parts.get(key)
+            if entry is not None:
+                self._parts.move_to_end(key)
+                self.counters["hits"] += 1
+                return entry[0]
+            self.counters["misses"] += 1
+
+        image_b64, mime_type = image_for_model(image_data, model)
+        part = build(image_b64, mime_type)
+        with self._lock:
+            if key not in self._parts:
+                self._parts[key] = (part, len(image_b64))
+                self._total_bytes += len(image_b64)
+            while self._total_bytes > self.max_bytes and len(self._parts) > 1:
+                _, (_, size) = self._parts.popitem(last=False)
+                self._total_bytes -= size
+                self.counters["evictions"] += 1
+        return part
+
+    def stats(self) -> Dict[str, Any]:
+        """Get hit/miss metrics for the cache"""
+        with self._lock:
+            return {
+                "entries": len(self._parts),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.counters["hits"],
+                "misses": self.counters["misses"],
+                "evictions": self.counters["evictions"]
+            }
+
+# Global cache of provider-ready image parts shared by the model wrappers
+image_part_cache = PreparedPartCache(IMAGE_PART_CACHE_BYTES)
@@ -2,8 +2,11 @@ import logging
 import os
 from datetime import datetime
 
+# Directory for log files
+LOG_DIR = os.getenv("LOG_DIR", "logs")
+
 # Create logs directory if it doesn't exist
-os.makedirs("logs", exist_ok=True)
+os.makedirs(LOG_DIR, exist_ok=True)
 
 # Set up logging format
 log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -12,7 +15,7 @@ log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 formatter = logging.Formatter(log_format)
 
 # Create a file handler that logs to a file with the current date
-log_file = f"logs/discord_bot_{datetime.now().strftime('%Y-%m-%d')}.log"
+log_file = os.path.join(LOG_DIR, f"discord_bot_{datetime.now().strftime('%Y-%m-%d')}.log")
 file_handler = logging.FileHandler(log_file)
 file_handler.setFormatter(formatter)
 
@@ -0,0 +1,105 @@
+import os
+import json
+import hashlib
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Optional
+from dotenv import load_dotenv
+from utils.disk_cache import LRUDirectory, atomic_write, sharded_path
+
+# Load environment variables
+load_dotenv()
+
+# Directory for cached parse results
+PARSE_CACHE_DIR = os.getenv("PARSE_CACHE_DIR", "parse_cache")
+
+# Maximum total size of cached parse results on disk, in bytes
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", "536870912"))
+
+class ParseCache:
+    """On-disk cache of parsed uploads, keyed by content hash and file type
+
+    Each result is one JSON file. When the cache grows past its size limit,
+    the least recently used results are deleted first. Parse times and hit
+    rates are tracked per file type.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._files = LRUDirectory(root, max_bytes)
+        self._stats: Dict[str, Dict[str, float]] = defaultdict(lambda: {"hits": 0, "misses": 0, "parses": 0, "parse_seconds": 0.0})
+
+    @staticmethod
+    def key(content: bytes, file_type: str) -> str:
+        """Build the cache key for a file's bytes and type"""
+        return f"{hashlib.sha256(content).hexdigest()}.{file_type}"
+
+    def _path(self, key: str) -> str:
+        return sharded_path(self.root, key, ".json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Read a cached parse result
+
+        Args:
+            key: The cache key from key()
+
+        Returns:
+            The parse result, or None if it is not cached
+        """
+        path = self._path(key)
+        if not self._files.touch(path):
+            return None
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            self._files.discard(path)
+            return None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a parse result, evicting the least recently used results beyond the size limit
+
+        Args:
+            key: The cache key from key()
+            result: The parse result to cache
+        """
+        path = self._path(key)
+        data = json.dumps(result).encode("utf-8")
+        atomic_write(path, data)
+        self._files.add(path, len(data))
+
+    def record(self, file_type: str, hit: bool, parse_seconds: float = 0.0) -> None:
+        """Record a cache lookup, and the parse time on a miss, for a file type"""
+        with self._lock:
+            stats = self._stats[file_type]
+            if hit:
+                stats["hits"] += 1
+            else:
+                stats["misses"] += 1
+                stats["parses"] += 1
+                stats["parse_seconds"] += parse_seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache size, hit rate and parse time metrics per file type"""
+        with self._lock:
+            by_type = {}
+            for file_type, stats in self._stats.items():
+                lookups = stats["hits"] + stats["misses"]
+                by_type[file_type] = {
+                    "hits": stats["hits"],
+                    "misses": stats["misses"],
+                    "hit_rate": stats["hits"] / lookups if lookups else 0.0,
+                    "avg_parse_ms": round(stats["parse_seconds"] / stats["parses"] * 1000, 3) if stats["parses"] else 0.0
+                }
+            return {
+                "entries": len(self._files),
+                "bytes": self._files.total_bytes,
+                "max_bytes": self.max_bytes,
+                "by_type": by_type
+            }
+
+# Global parse cache shared by the file parsers
+parse_cache = ParseCache(PARSE_CACHE_DIR, PARSE_CACHE_MAX_BYTES)
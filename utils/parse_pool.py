@@ -0,0 +1,219 @@
+import io
+import os
+import asyncio
+import weakref
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Number of worker processes for document parsing
+PARSE_PROCESS_POOL_SIZE = int(os.getenv("PARSE_PROCESS_POOL_SIZE", "2"))
+
+# Maximum documents parsing or waiting for a worker before new uploads are turned away
+PARSE_MAX_PENDING = int(os.getenv("PARSE_MAX_PENDING", "8"))
+
+# Seconds a single document may take to parse
+PARSE_TIMEOUT = float(os.getenv("PARSE_TIMEOUT", "30"))
+
+# Largest document accepted for parsing, in bytes
+PARSE_MAX_FILE_BYTES = int(os.getenv("PARSE_MAX_FILE_BYTES", "26214400"))
+
+# Maximum PDF pages extracted; later pages are skipped
+PARSE_MAX_PDF_PAGES = int(os.getenv("PARSE_MAX_PDF_PAGES", "300"))
+
+# Maximum characters of PDF text extracted; extraction stops at the page that reaches it
+PARSE_MAX_PDF_CHARS = int(os.getenv("PARSE_MAX_PDF_CHARS", "500000"))
+
+class ParserBusyError(Exception):
+    """Raised when the parse pool is saturated and cannot accept more documents"""
+
+class ParseTimeoutError(Exception):
+    """Raised when a document takes longer than the timeout to parse"""
+
+def iter_pdf_pages(reader: Any, first_page: int = 1, last_page: Optional[int] = None) -> Iterator[Tuple[int, str]]:
+    """Yield (page number, text) for a range of PDF pages, extracting one page at a time
+
+    Args:
+        reader: An open pypdf PdfReader
+        first_page: First page to extract, counting from 1
+        last_page: Last page to extract, or None for the end of the document
+    """
+    last_page = len(reader.pages) if last_page is None else min(last_page, len(reader.pages))
+    for number in range(first_page, last_page + 1):
+        yield number, reader.pages[number - 1].extract_text() or ""
+
+def extract_pdf_pages(content: bytes, max_pages: int, max_chars: int, first_page: int = 1, last_page: Optional[int] = None) -> Dict[str, Any]:
+    """Extract text page by page from a PDF, stopping early at the page or character limit (runs in a worker process)
+
+    Args:
+        content: The PDF bytes
+        max_pages: Maximum number of pages to extract
+        max_chars: Maximum characters to extract; the page that reaches it is the last one kept
+        first_page: First page to extract, counting from 1
+        last_page: Last page to extract, or None for the end of the document
+
+    Returns:
+        A dictionary with the non-empty pages as {"page", "text"} chunks, the document's
+        total page count, and whether extraction stopped at a limit
+    """
+    from pypdf import PdfReader
+
+    reader = PdfReader(io.BytesIO(content))
+    chunks = []
+    pages = chars = 0
+    truncated = False
+    end_page = len(reader.pages) if last_page is None else min(last_page, len(reader.pages))
+    for number, text in iter_pdf_pages(reader, first_page, last_page):
+        pages += 1
+        text = text.strip()
+        if text:
+            chunks.append({"page": number, "text": text})
+            chars += len(text)
+        # Check the limits before pulling the next page, so no page is extracted only to be dropped
+        if pages >= max_pages or chars >= max_chars:
+            truncated = number < end_page
+            break
+    return {"chunks": chunks, "total_pages": len(reader.pages), "truncated": truncated}
+
+def extract_docx_text(content: bytes) -> str:
+    """Extract paragraph and table text from a DOCX file (runs in a worker process)"""
+    import docx
+
+    doc = docx.Document(io.BytesIO(content))
+    parts = [para.text for para in doc.paragraphs]
+    for table in doc.tables:
+        for row in table.rows:
+            parts.append(" ".join(cell.text for cell in row.cells))
+    return "\n".join(parts)
+
+class ParsePool:
+    """Bounded process pool for CPU-bound document parsing
+
+    Keeps parsing off the event loop and out of the interpreter lock. Admission
+    is bounded: once max_pending documents are parsing or queued, new ones are
+    rejected with ParserBusyError instead of queueing without limit. Documents
+    are handed to the executor only when a worker is free, so the timeout
+    measures parsing alone, not time spent queued. A document that exceeds the
+    timeout has the worker processes killed and the pool rebuilt; documents that
+    were parsing alongside it are run again on the fresh workers.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Executors killed after a timeout, whose other jobs are run again
+        self._killed: "weakref.WeakSet[ProcessPoolExecutor]" = weakref.WeakSet()
+        # Free workers, created lazily on the running event loop
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._retried = 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Start the worker processes on first use"""
+        with self._lock:
+            if self._executor is None:
+                # Spawn rather than fork, since the parent process runs threads
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor) -> None:
+        """Kill a pool whose worker is stuck, so the next document gets fresh workers"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+            self._killed.add(executor)
+        # The executor has no public way to stop a running task, so terminate its workers
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        """Run a parsing function in a worker process
+
+        Args:
+            func: A module-level function to call
+            *args: Picklable arguments for the function
+
+        Returns:
+            The function's return value
+
+        Raises:
+            ParserBusyError: If max_pending documents are already parsing or queued
+            ParseTimeoutError: If the function runs longer than the timeout
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ParserBusyError("The file parser is busy right now. Please try again in a moment.")
+            self._pending += 1
+
+        try:
+            if self._slots is None:
+                self._slots = asyncio.Semaphore(self.max_workers)
+            async with self._slots:
+                return await self._run_in_worker(func, args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    async def _run_in_worker(self, func: Callable[..., Any], args: Tuple[Any, ...]) -> Any:
+        """Run a parsing function on a free worker, within the timeout"""
+        while True:
+            executor = self._get_executor()
+            try:
+                future = asyncio.wrap_future(executor.submit(func, *args))
+                result = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self._timeouts += 1
+                self._reset(executor)
+                raise ParseTimeoutError(f"Parsing took longer than {self.timeout:g} seconds")
+            except BrokenProcessPool:
+                if executor in self._killed:
+                    # Another document's timeout killed the workers; parse this one again
+                    with self._lock:
+                        self._retried += 1
+                    continue
+                self._reset(executor)
+                raise
+
+            with self._lock:
+                self._completed += 1
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Get load and backpressure metrics for the pool"""
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "saturation": self._pending / self.max_pending if self.max_pending else 0.0,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "retried": self._retried
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._slots = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+# Global pool for document parsing
+parse_pool = ParsePool(PARSE_PROCESS_POOL_SIZE, PARSE_MAX_PENDING, PARSE_TIMEOUT)
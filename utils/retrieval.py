@@ -0,0 +1,218 @@
+import os
+import re
+import json
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional
+from dotenv import load_dotenv
+from utils.disk_cache import LRUDirectory, atomic_write, sharded_path
+
+# Load environment variables
+load_dotenv()
+
+# Directory for document retrieval indexes
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", "retrieval_index")
+
+# Maximum total size of document indexes on disk, in bytes
+RETRIEVAL_INDEX_MAX_BYTES = int(os.getenv("RETRIEVAL_INDEX_MAX_BYTES", "536870912"))
+
+# Number of document chunks retrieved for each question
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "5"))
+
+# Documents up to this many tokens are sent whole instead of being searched
+RETRIEVAL_FULL_TEXT_TOKENS = int(os.getenv("RETRIEVAL_FULL_TEXT_TOKENS", "2000"))
+
+# Number of indexes kept loaded in memory
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "32"))
+
+# Target size, in characters, of the sections unpaged documents are split into
+SECTION_CHARS = 1500
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase word terms"""
+    return re.findall(r"\w+", text.lower())
+
+def chunk_text(text: str, max_chars: int = SECTION_CHARS) -> List[Dict[str, Any]]:
+    """Split unpaged text into numbered sections along paragraph boundaries
+
+    Args:
+        text: The text to split
+        max_chars: Target section size; a single longer paragraph becomes its own section
+
+    Returns:
+        A list of {"section", "text"} chunks
+    """
+    sections, current, size = [], [], 0
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and size + len(paragraph) > max_chars:
+            sections.append("\n".join(current))
+            current, size = [], 0
+        current.append(paragraph)
+        size += len(paragraph) + 1
+    if current:
+        sections.append("\n".join(current))
+    return [{"section": number, "text": section} for number, section in enumerate(sections, start=1)]
+
+class BM25Index:
+    """BM25 keyword index over a document's chunks
+
+    Holds the chunks themselves, so session history only needs to keep a
+    reference to the document.
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]], lengths: List[int], postings: Dict[str, List[List[int]]]):
+        self.chunks = chunks
+        self.lengths = lengths
+        self.postings = postings
+        self.avg_length = sum(lengths) / len(lengths) if lengths else 0.0
+
+    @classmethod
+    def build(cls, chunks: List[Dict[str, Any]]) -> "BM25Index":
+        """Index a document's chunks
+
+        Args:
+            chunks: The document's chunks, each with a "text" field
+
+        Returns:
+            The index
+        """
+        lengths = []
+        postings: Dict[str, List[List[int]]] = {}
+        for position, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk["text"]))
+            lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append([position, frequency])
+        return cls(chunks, lengths, postings)
+
+    def search(self, query: str, k: int) -> List[Dict[str, Any]]:
+        """Find the chunks most relevant to a query
+
+        Args:
+            query: The question to match
+            k: Maximum number of chunks to return
+
+        Returns:
+            Up to k matching chunks, most relevant first; empty if no term matches
+        """
+        scores: Dict[int, float] = {}
+        count = len(self.chunks)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for position, frequency in postings:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[position] / self.avg_length)
+                scores[position] = scores.get(position, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+
+        best = sorted(scores, key=lambda position: (-scores[position], position))[:k]
+        return [self.chunks[position] for position in best]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"chunks": self.chunks, "lengths": self.lengths, "postings": self.postings}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        return cls(data["chunks"], data["lengths"], data["postings"])
+
+class DocumentIndexStore:
+    """On-disk store of document indexes, keyed by document ID, with an in-memory LRU of loaded indexes
+
+    Document IDs are derived from content hashes, so a document uploaded to
+    several sessions is indexed once. When the store grows past its size
+    limit, the least recently used indexes are deleted first; documents whose
+    index was deleted are left out of later prompts.
+    """
+
+    def __init__(self, root: str, cache_size: int, max_bytes: int = RETRIEVAL_INDEX_MAX_BYTES):
+        self.root = root
+        self.cache_size = cache_size
+        self._files = LRUDirectory(root, max_bytes)
+        self._loaded: "OrderedDict[str, BM25Index]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters: Counter = Counter()
+
+    def _path(self, doc_id: str) -> str:
+        return sharded_path(self.root, doc_id, ".json")
+
+    def _remember(self, doc_id: str, index: BM25Index) -> None:
+        with self._lock:
+            self._loaded[doc_id] = index
+            self._loaded.move_to_end(doc_id)
+            while len(self._loaded) > self.cache_size:
+                self._loaded.popitem(last=False)
+
+    def put(self, doc_id: str, chunks: List[Dict[str, Any]]) -> None:
+        """Build and store the index for a document, unless it is already stored
+
+        Args:
+            doc_id: The document ID
+            chunks: The document's chunks
+        """
+        path = self._path(doc_id)
+        if self._files.touch(path):
+            return
+
+        index = BM25Index.build(chunks)
+        self.counters["builds"] += 1
+        data = json.dumps(index.to_dict()).encode("utf-8")
+        atomic_write(path, data)
+        self._files.add(path, len(data))
+        self._remember(doc_id, index)
+
+    def get(self, doc_id: str) -> Optional[BM25Index]:
+        """Load the index for a document
+
+        Args:
+            doc_id: The document ID
+
+        Returns:
+            The index, or None if it is not stored
+        """
+        with self._lock:
+            index = self._loaded.get(doc_id)
+            if index is not None:
+                self._loaded.move_to_end(doc_id)
+                self.counters["hits"] += 1
+                return index
+
+        path = self._path(doc_id)
+        try:
+            if not self._files.touch(path):
+                raise FileNotFoundError(path)
+            with open(path, "r", encoding="utf-8") as f:
+                index = BM25Index.from_dict(json.load(f))
+        except (OSError, ValueError):
+            self._files.discard(path)
+            self.counters["missing"] += 1
+            return None
+        self.counters["loads"] += 1
+        self._remember(doc_id, index)
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        """Get build and load metrics for the store"""
+        with self._lock:
+            return {
+                "loaded": len(self._loaded),
+                "cache_size": self.cache_size,
+                "entries": len(self._files),
+                "bytes": self._files.total_bytes,
+                "max_bytes": self._files.max_bytes,
+                "builds": self.counters["builds"],
+                "hits": self.counters["hits"],
+                "loads": self.counters["loads"],
+                "missing": self.counters["missing"]
+            }
+
+# Global document index store shared by uploads and context assembly
+document_index = DocumentIndexStore(RETRIEVAL_INDEX_DIR, RETRIEVAL_CACHE_SIZE)
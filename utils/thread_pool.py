@@ -0,0 +1,108 @@
+import os
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# Number of worker threads for blocking provider calls
+PROVIDER_THREAD_POOL_SIZE = int(os.getenv("PROVIDER_THREAD_POOL_SIZE", "8"))
+
+class InstrumentedThreadPool:
+    """Bounded thread pool for blocking calls that have no async API
+
+    Tracks how many calls are running and how many are waiting for a worker,
+    so the pool can be sized from its queue-depth and saturation metrics.
+    """
+
+    def __init__(self, max_workers: int, name: str = "pool"):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        # Calls submitted but not yet picked up by a worker
+        self._waiting = 0
+        self._active = 0
+        self._peak_queued = 0
+        self._completed = 0
+        self._failed = 0
+
+    def _queued(self) -> int:
+        """Calls waiting for a worker; a call submitted while a worker is idle starts at once, so it never counts"""
+        return max(self._waiting - (self.max_workers - self._active), 0)
+
+    def _run(self, func: Callable[[], Any], started: List[bool]) -> Any:
+        with self._lock:
+            # Whichever of the worker and a cancelled caller gets here first stops the wait
+            if not started:
+                self._waiting -= 1
+                started.append(True)
+            self._active += 1
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self._active -= 1
+
+    async def run(self, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run a blocking function on the pool without blocking the event loop
+
+        Args:
+            func: The blocking function to call
+            *args: Positional arguments for the function
+            **kwargs: Keyword arguments for the function
+
+        Returns:
+            The function's return value
+        """
+        started: List[bool] = []
+        with self._lock:
+            self._waiting += 1
+            self._peak_queued = max(self._peak_queued, self._queued())
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, self._run, partial(func, *args, **kwargs), started)
+            with self._lock:
+                self._completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                # A call cancelled before a worker picked it up is no longer waiting
+                if not started:
+                    self._waiting -= 1
+                    started.append(False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get queue-depth and saturation metrics for the pool
+
+        Returns:
+            A dictionary of pool metrics
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queued": self._queued(),
+                "peak_queued": self._peak_queued,
+                "saturation": self._active / self.max_workers,
+                "completed": self._completed,
+                "failed": self._failed
+            }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once queued calls finish"""
+        self._executor.shutdown(wait=False)
+
+# Global pool for blocking provider work
+provider_pool = InstrumentedThreadPool(PROVIDER_THREAD_POOL_SIZE, name="provider")
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function on the shared provider thread pool"""
+    return await provider_pool.run(func, *args, **kwargs)